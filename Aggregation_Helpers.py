@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Counting helpers for the report scripts (In_Class_Exercise.py, Visualizing_With_Pandas.py)
+#
+# - "Top 20 countries by number of athletes" is usually written as groupby().size().sort_values()[-20:]: the group
+#   sizes are found by hashing every row into a hash table, and then all of them are sorted just to keep 20.
+#
+# - top_n() factorizes the column once (one integer code per row), counts the codes with np.bincount and picks the
+#   n largest counts with np.argpartition, so only the counts of the top groups (and any ties with the n-th one)
+#   are ever sorted. Groups with the same count are ordered by their label, so the result does not depend on the
+#   order of the rows.
+#
+# - Factorizing means hashing every value, and for a column of strings that is nearly all of the time: bincount and
+#   argpartition take a few milliseconds of it at 10 million rows. A categorical column already is factorized, so
+#   its codes are counted directly (about 15 times faster than factorizing the strings).
+
+import numpy as np
+import pandas as pd
+
+
+# Counts of every value of values, as (counts, values). Missing values are not counted, like in groupby(). weights (one
+# per row) are summed instead of counting rows.
+def group_counts(values, weights=None):
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    present = codes >= 0
+    if not present.all():
+        codes = codes[present]
+        weights = None if weights is None else np.asarray(weights)[present]
+    counts = np.bincount(codes, weights=weights, minlength=len(uniques))
+    if weights is not None and np.issubdtype(np.asarray(weights).dtype, np.integer):
+        counts = counts.astype(np.int64)
+    return counts, uniques
+
+
+# The n most frequent values of values with their counts, largest first, as a Series like
+# values.groupby(values).size().sort_values(ascending=False)[:n] -- except that ties are ordered by value
+def top_n(values, n=20, weights=None):
+    counts, uniques = group_counts(values, weights)
+
+    if n <= 0:
+        candidates = np.zeros(0, dtype=np.intp)
+    elif n < len(counts):
+        # the n-th largest count, and every group that has at least that many (ties with the n-th one included)
+        nth = counts[np.argpartition(counts, len(counts) - n)[len(counts) - n]]
+        candidates = np.flatnonzero(counts >= nth)
+    else:
+        candidates = np.arange(len(counts))
+    # (categories that don't occur in values are left out, like groupby(observed=True) does)
+    candidates = candidates[counts[candidates] > 0]
+
+    # largest count first, then by value
+    candidates = candidates[np.argsort(np.asarray(uniques[candidates]), kind='stable')]
+    top = candidates[np.argsort(-counts[candidates], kind='stable')][:n]
+    return pd.Series(counts[top], index=pd.Index(uniques[top], name=getattr(values, 'name', None)))
+
+
+# Above this many cells the joint counts of all the columns of crosstabs() would take too much memory, and every
+# table is counted on its own instead (still from the shared codes)
+MAX_JOINT_CELLS = 1 << 22
+
+
+# Like [pd.crosstab(frame[rows], frame[columns], margins=margins) for rows, columns in pairs], in one pass over the
+# frame: every column is factorized once however many tables it is in, the rows are counted once by the combination
+# of all their values, and each table is then summed out of those joint counts.
+def crosstabs(frame, pairs, margins=False):
+    names = list(dict.fromkeys(name for pair in pairs for name in pair))
+
+    # one code per row and column, with missing values getting a code of their own (the last one)
+    codes, uniques, sizes = {}, {}, {}
+    for name in names:
+        columnCodes, uniques[name] = pd.factorize(frame[name], sort=True)
+        sizes[name] = len(uniques[name]) + 1
+        codes[name] = np.where(columnCodes < 0, sizes[name] - 1, columnCodes)
+
+    jointCells = int(np.prod([sizes[name] for name in names], dtype=float))
+    if jointCells <= MAX_JOINT_CELLS and all(rows != columns for rows, columns in pairs):
+        joint = np.zeros(len(frame), dtype=np.int64)
+        for name in names:
+            joint = joint * sizes[name] + codes[name]
+        counts = np.bincount(joint, minlength=jointCells).reshape([sizes[name] for name in names])
+
+        def table_counts(rows, columns):
+            others = tuple(axis for axis, name in enumerate(names) if name not in (rows, columns))
+            table = counts.sum(axis=others) if others else counts
+            return table if names.index(rows) < names.index(columns) else table.T
+    else:
+        def table_counts(rows, columns):
+            pairCodes = codes[rows] * sizes[columns] + codes[columns]
+            return np.bincount(pairCodes, minlength=sizes[rows] * sizes[columns]).reshape(sizes[rows], sizes[columns])
+
+    return [_crosstab_frame(table_counts(rows, columns)[:-1, :-1], uniques[rows], uniques[columns],
+                            rows, columns, margins) for rows, columns in pairs]
+
+
+# The DataFrame pd.crosstab() would return for the counts of a table (missing values left out already)
+def _crosstab_frame(counts, rowValues, columnValues, rows, columns, margins):
+    # values that only occur next to a missing value are left out, like crosstab does
+    keepRows, keepColumns = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+    counts = counts[keepRows][:, keepColumns]
+    index = pd.Index(rowValues[keepRows], name=rows)
+    columnIndex = pd.Index(columnValues[keepColumns], name=columns)
+
+    if margins:
+        counts = np.vstack([np.column_stack([counts, counts.sum(axis=1)]),
+                            np.append(counts.sum(axis=0), counts.sum())])
+        index = pd.Index(list(index) + ['All'], dtype=object, name=rows)
+        columnIndex = pd.Index(list(columnIndex) + ['All'], dtype=object, name=columns)
+    return pd.DataFrame(counts, index=index, columns=columnIndex)
+
+
+# Counts of the values of some columns and crosstabs of some pairs of columns, updated a chunk of rows at a time (e.g.
+# with the chunks of Dataset_Loader.read_chunks()). Only the counts are kept, so the memory they take depends on the
+# number of distinct values, not on the number of rows.
+class StreamingCounts:
+
+    def __init__(self, columns=(), pairs=()):
+        self.columns = list(columns)
+        self.pairs = list(pairs)
+        self.rows = 0
+        self._counts = {column: pd.Series(dtype=np.int64) for column in self.columns}
+        self._tables = {pair: None for pair in self.pairs}
+
+    def update(self, chunk):
+        for column in self.columns:
+            counts, values = group_counts(chunk[column])
+            self._counts[column] = self._counts[column].add(pd.Series(counts, index=values), fill_value=0)
+        for pair, table in zip(self.pairs, crosstabs(chunk, self.pairs)):
+            total = self._tables[pair]
+            self._tables[pair] = table if total is None else total.add(table, fill_value=0)
+        self.rows += len(chunk)
+
+    # The number of rows of every value of column, like chunks.groupby(column).size() of all the chunks together
+    def counts(self, column):
+        return self._counts[column].astype(np.int64).rename_axis(column)
+
+    # Like top_n() of the column of all the chunks together
+    def top_n(self, column, n=20):
+        counts = self.counts(column)
+        return top_n(counts.index, n, weights=counts.to_numpy())
+
+    # Like pd.crosstab() of the two columns of all the chunks together
+    def crosstab(self, rows, columns, margins=False):
+        table = self._tables[(rows, columns)]
+        if table is None:
+            return crosstabs(pd.DataFrame({rows: [], columns: []}), [(rows, columns)], margins)[0]
+        table = table.fillna(0).astype(np.int64)
+        return _crosstab_frame(table.to_numpy(), table.index, table.columns, rows, columns, margins)
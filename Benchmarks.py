@@ -0,0 +1,712 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmarks for the data loading and plotting code used by the Panel apps
+#
+# Run all of them with
+# >   python Benchmarks.py
+# or only some of them with
+# >   python Benchmarks.py loader --rows 1000000
+#
+# Every benchmark works on synthetic data written to a temporary folder, so none of the real workbooks are needed.
+#
+# The script benchmarks (olympics, tips, static_mpl, two_ways, reactive_api, auto_bokeh) run a whole teaching script
+# headlessly, the way a reader runs the notebook, on synthetic workbooks of --script-rows rows, and then time each of
+# its reactive plot functions. Besides the time they report the peak memory of the process during the run.
+#
+# Keep the numbers of a run with --save-baseline baseline.json, and compare a later run (e.g. on a branch) against
+# them with --baseline baseline.json: every measurement gets its ratio to the baseline, and the run fails if any of
+# them got slower than --max-slowdown.
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+# Creates a DataFrame with the same columns and value ranges as AutoMPG.xlsx, with as many rows as we like
+def make_synthetic_auto(nRows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    origin = rng.integers(1, 4, nRows)
+    weight = rng.integers(1600, 5200, nRows)
+
+    return pd.DataFrame({'MPG': rng.uniform(9, 47, nRows).round(1),
+                         'Cylinder': rng.choice([3, 4, 5, 6, 8], nRows),
+                         'Displacement': rng.uniform(68, 455, nRows).round(0),
+                         'Horsepower': rng.integers(46, 230, nRows),
+                         'Weight': weight,
+                         'Acceleration': rng.uniform(8, 25, nRows).round(1),
+                         'Origin': origin,
+                         'Origin_Country': np.array(['USA', 'Europe', 'Japan'])[origin - 1],
+                         'Weight_Size': (weight / 300).round(2)})
+
+
+# Creates a DataFrame with the columns of tips.xlsx (the seaborn tips dataset)
+def make_synthetic_tips(nRows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    totalBill = rng.uniform(3, 51, nRows).round(2)
+    return pd.DataFrame({'total_bill': totalBill,
+                         'tip': (totalBill * rng.uniform(0.05, 0.3, nRows)).round(2),
+                         'sex': rng.choice(['Male', 'Female'], nRows),
+                         'smoker': rng.choice(['Yes', 'No'], nRows),
+                         'day': rng.choice(['Thur', 'Fri', 'Sat', 'Sun'], nRows),
+                         'time': rng.choice(['Lunch', 'Dinner'], nRows),
+                         'size': rng.integers(1, 7, nRows)})
+
+
+# Creates a DataFrame with the columns of Olympics2016.xlsx used by In_Class_Exercise.py: one row per athlete and
+# event, with a few countries sending most of the athletes, and a medal for about one row in seven
+def make_synthetic_olympics(nRows, seed=0, nCountries=200):
+    rng = np.random.default_rng(seed)
+
+    countries = np.array(['C{:03d}'.format(country) for country in range(nCountries)])
+    weights = 1 / np.arange(1, nCountries + 1)
+    medals = np.array(['Gold', 'Silver', 'Bronze', None], dtype=object)
+    return pd.DataFrame({'ID': rng.integers(1, nRows // 2 + 2, nRows),
+                         'Sex': rng.choice(['M', 'F'], nRows),
+                         'Age': rng.integers(14, 60, nRows),
+                         'NOC': rng.choice(countries, nRows, p=weights / weights.sum()),
+                         'Year': 2016,
+                         'Sport': rng.choice(['Athletics', 'Swimming', 'Rowing', 'Judo', 'Fencing'], nRows),
+                         'Medal': medals[rng.choice(4, nRows, p=[0.05, 0.05, 0.05, 0.85])]})
+
+
+# Every measurement of this run, for --save-baseline/--baseline: {"benchmark: variant": {'seconds':, 'peakMB':}}
+# (peakMB is None for the benchmarks that don't measure memory)
+results = {}
+
+
+# Prints one line per measured variant so that runs are easy to compare
+def report(benchmark, variant, seconds, extra="", peakMB=None):
+    if peakMB is not None:
+        extra = "peak +{:.0f} MB  {}".format(peakMB, extra)
+    print("{:<12} {:<34} {:>10.4f} s  {}".format(benchmark, variant, seconds, extra))
+    results["{}: {}".format(benchmark, variant)] = {'seconds': seconds, 'peakMB': peakMB}
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Measures how far the memory of the process peaked above where it was when the with block started (in MB, as .peakMB).
+# On Linux the kernel's high water mark of the resident memory is reset first, elsewhere tracemalloc counts the Python
+# (and NumPy) allocations instead.
+class PeakMemory:
+
+    def __enter__(self):
+        self.peakMB = None
+        try:
+            with open("/proc/self/clear_refs", "w") as clearRefs:
+                clearRefs.write("5")
+            self._tracing = False
+            self._startMB = rss_mb()
+        except OSError:
+            tracemalloc.start()
+            self._tracing = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._tracing:
+            self.peakMB = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            return
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    self.peakMB = max(int(line.split()[1]) / 2**10 - self._startMB, 0.0)
+
+
+# ### Dataset loader
+# A served "session" used to cost one pd.read_excel(); with Dataset_Loader it costs a dictionary lookup
+# in an already running process, or one Parquet read in a freshly started one.
+
+def bench_loader(args):
+    import Dataset_Loader
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "AutoMPG.xlsx")
+
+        start = time.perf_counter()
+        make_synthetic_auto(args.rows).to_excel(path, index=False)
+        report("loader", "write synthetic workbook", time.perf_counter() - start, "{:,} rows".format(args.rows))
+
+        before = timed(lambda: pd.read_excel(path), args.repeat)
+        report("loader", "before: pd.read_excel per session", before, "{:.2f} sessions/s".format(1 / before))
+
+        start = time.perf_counter()
+        Dataset_Loader.load_dataset(path)
+        report("loader", "first load (convert to columnar)", time.perf_counter() - start)
+
+        # A new server process only has the columnar cache on disk, not the frame in memory
+        script = "import sys, time; sys.path.insert(0, {!r}); import Dataset_Loader; " \
+                 "start = time.perf_counter(); Dataset_Loader.load_dataset({!r}); " \
+                 "print(time.perf_counter() - start)".format(os.path.dirname(os.path.abspath(__file__)), path)
+        cold = min(float(subprocess.check_output([sys.executable, "-c", script])) for _ in range(args.repeat))
+        report("loader", "after: new process (columnar)", cold, "{:.2f} sessions/s".format(1 / cold))
+
+        warm = timed(lambda: Dataset_Loader.load_dataset(path), max(args.repeat, 100))
+        report("loader", "after: running process (shared)", warm, "{:.0f} sessions/s".format(1 / warm))
+
+
+# ### Matplotlib soak test
+# Drives the size slider of Panel_ReactiveAPI.react_mpl_plot through many widget events, the way a long running server
+# would, and checks that the resident memory of the process stays flat instead of growing with every event.
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def bench_mpl_soak(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import panel as pn
+    from bokeh.document import Document
+    from Panel_Helpers import renderCache
+
+    with tempfile.TemporaryDirectory() as folder:
+        make_synthetic_auto(400).to_excel(os.path.join(folder, "AutoMPG.xlsx"), index=False)
+
+        # the real callback of the first Reactive API app, with its own size slider
+        import Panel_ReactiveAPI
+        with _headless(folder):
+            Panel_ReactiveAPI.load_data()
+        react_mpl_plot = Panel_ReactiveAPI.react_mpl_plot
+        uS = Panel_ReactiveAPI.plotWidgets[3]
+
+        # Rendering into a Document makes Panel call the callback for every event, just like in a served session. The
+        # PNG cache is cleared first, so that every event draws and encodes the figure again instead of hitting it.
+        pn.panel(react_mpl_plot).get_root(Document())
+
+        def drive(events):
+            for event in range(events):
+                renderCache.clear()
+                uS.value = event % 20 + 1
+
+        warmup = min(500, args.events)
+        drive(warmup)
+        before = rss_mb()
+
+        start = time.perf_counter()
+        drive(args.events)
+        elapsed = time.perf_counter() - start
+        growth = rss_mb() - before
+
+    report("mpl_soak", "{:,} widget events".format(args.events), elapsed,
+           "RSS growth {:.1f} MB, pyplot figures open: {}".format(growth, len(plt.get_fignums())))
+    if growth > args.max_rss_growth:
+        sys.exit("mpl_soak: RSS grew by {:.1f} MB (limit {} MB)".format(growth, args.max_rss_growth))
+
+
+# ### Coalesced widget events
+# Drags the size slider across its whole range, one event every few milliseconds like a browser sends them, with a
+# plot function that renders a PNG on every call. Rendering every event makes the plot fall seconds behind the slider;
+# coalesced() only renders the values that are still current when a render can start.
+
+# Waits until a RenderQueue has rendered (or dropped) everything queued
+def wait_for_renders(queue):
+    while queue.stats()['queueDepth'] or queue.stats()['running']:
+        time.sleep(0.001)
+
+
+def bench_coalesce(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import panel as pn
+    from Mpl_Helpers import FigurePool, draw_scatter
+    from Panel_Helpers import RenderQueue, coalesced
+
+    auto = make_synthetic_auto(400)
+    mplPool = FigurePool()
+    drags, interval = 5, 0.005
+
+    def react_mpl_plot(uSize):
+        rFig, rPlot, _ = mplPool.get('react_mpl_plot', figsize=(7, 5))
+        draw_scatter(rPlot, auto['Weight'], auto['Horsepower'], color='#654321', s=uSize**2, alpha=0.25)
+        buffer = io.BytesIO()
+        rFig.savefig(buffer, format='png')
+        return pn.pane.PNG(buffer.getvalue())
+
+    def drag(uS):
+        for _ in range(drags):
+            for value in list(range(2, 21)) + list(range(19, 0, -1)):
+                uS.value = value
+                time.sleep(interval)
+
+    events = drags * 38
+
+    uS = pn.widgets.IntSlider(start=1, end=20, value=1)
+    pane = pn.Column(react_mpl_plot(uS.value))
+    uS.param.watch(lambda event: pane.__setitem__(0, react_mpl_plot(event.new)), 'value')
+    start = time.perf_counter()
+    drag(uS)
+    report("coalesce", "before: render every event", time.perf_counter() - start,
+           "{} events, {} renders".format(events, events))
+
+    queue = RenderQueue()
+    uS = pn.widgets.IntSlider(start=1, end=20, value=1)
+    coalesced(react_mpl_plot, uS, queue=queue)
+    start = time.perf_counter()
+    drag(uS)
+    wait_for_renders(queue)
+    stats = queue.stats()
+    report("coalesce", "after: coalesced", time.perf_counter() - start,
+           "{events} events, {rendered} renders, {dropped} dropped, {superseded} superseded".format(**stats))
+
+
+# ### Render pool
+# Concurrent sessions each rendering a series of scatter plots: with threads in the server process (the GIL lets only
+# one of them draw at a time) and with RenderPools of increasing size (one render per core at a time).
+
+def bench_render_pool(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    from concurrent.futures import ThreadPoolExecutor
+    from Mpl_Helpers import scatter_figure
+    from Render_Pool import RenderPool, _render
+
+    rendersPerSession = 8
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as folder:
+        # the size of the real AutoMPG.xlsx: rendering, not reading the data, is what is measured here
+        path = os.path.join(folder, "AutoMPG.xlsx")
+        make_synthetic_auto(400).to_excel(path, index=False)
+
+        # every session renders its own figure with its own marker sizes, so nothing is shared or cached
+        jobs = [('session{}'.format(session), path, 'Weight', 'Horsepower', '#654321', size + 1)
+                for session in range(args.sessions) for size in range(rendersPerSession)]
+        renders = len(jobs)
+
+        with ThreadPoolExecutor(args.sessions) as threads:
+            start = time.perf_counter()
+            list(threads.map(lambda job: _render(scatter_figure, job, {}, 'png', 144), jobs))
+            elapsed = time.perf_counter() - start
+        report("render_pool", "before: {} threads in process".format(args.sessions), elapsed,
+               "{:.1f} renders/s".format(renders / elapsed))
+
+        for processes in sorted({1, 2, cores}):
+            pool = RenderPool(processes, preload=[path])
+            start = time.perf_counter()
+            for future in [pool.submit(scatter_figure, *job) for job in jobs]:
+                future.result()
+            elapsed = time.perf_counter() - start
+            pool.shutdown()
+            report("render_pool", "after: {} worker process(es)".format(processes), elapsed,
+                   "{:.1f} renders/s ({} cores)".format(renders / elapsed, cores))
+
+
+# ### Density images
+# Above Raster_Helpers.DENSITY_THRESHOLD points the scatter plots send one density image per view instead of every
+# point. Measures the time to bin and shade the points and compares the size of what is sent to the browser.
+
+def bench_density(args):
+    from Raster_Helpers import data_range, rasterize, shade
+
+    for nRows in (10000, 1000000, 10000000):
+        auto = make_synthetic_auto(nRows)
+        x = auto['Horsepower'].to_numpy(dtype=float)
+        y = auto['Weight'].to_numpy(dtype=float)
+        codes, factors = pd.factorize(auto['Origin_Country'])
+        colors = ['#1f77b4', '#ff7f0e', '#2ca02c']
+
+        xRange, yRange = data_range(x), data_range(y)
+        seconds = timed(lambda: shade(rasterize(x, y, codes, len(factors), xRange, yRange), colors), args.repeat)
+        image = shade(rasterize(x, y, codes, len(factors), xRange, yRange), colors)
+
+        # x, y and the marker size as float64 plus one byte per country code, i.e. the binary buffers bokeh would send
+        pointBytes = nRows * (3 * 8 + 1)
+        report("density", "rasterize + shade {:,} rows".format(nRows), seconds,
+               "image {:,} bytes vs points {:,} bytes".format(image.nbytes, pointBytes))
+
+
+# ### Streaming appends
+# New records are appended to a DatasetStream in batches while dozens of sessions show the dataset. Every session
+# gets the new rows with one ColumnDataSource.stream() call per tick, however many batches arrived in between.
+
+def bench_stream(args):
+    import Dataset_Loader
+    from bokeh.document import Document
+    from Bokeh_Helpers import StreamedSource, make_cds
+
+    batchRows, batchesPerTick, ticks = 100, 10, 50
+    auto = make_synthetic_auto(400)
+    records = make_synthetic_auto(batchRows, seed=1).drop(columns=['Weight_Size'])
+    Dataset_Loader.declare_column('Weight_Size', lambda frame: (frame['Weight'] / 300).round(2))
+
+    stream = Dataset_Loader.DatasetStream(auto, "benchmark", rollover=10000)
+    sessions = []
+    for _ in range(args.sessions):
+        source = make_cds(auto, list(auto.columns))
+        Document().add_root(source)
+        sessions.append(StreamedSource(source, stream, auto, source.document))
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for _ in range(batchesPerTick):
+            stream.append(records)
+        # in a served app each session's document runs its flush() on the next tick
+        for session in sessions:
+            session.flush()
+    elapsed = time.perf_counter() - start
+
+    rows = batchRows * batchesPerTick * ticks
+    report("stream", "{:,} rows to {} sessions".format(rows, args.sessions), elapsed,
+           "{:,.0f} rows/s, {:,} rows per session kept".format(rows / elapsed, len(sessions[0].source.data['MPG'])))
+
+
+# ### Top countries
+# The top 20 countries by number of athletes, the way In_Class_Exercise.py used to count them (groupby, sort all the
+# group sizes, slice) and with Aggregation_Helpers.top_n(), at 10 million rows. Both spend most of their time hashing
+# the country names, which a categorical column has done already.
+
+def bench_top_n(args):
+    from Aggregation_Helpers import top_n
+
+    olympics = make_synthetic_olympics(10000000)
+    noc = olympics['NOC']
+
+    seconds = timed(lambda: noc.groupby(noc).size().sort_values()[-20:], args.repeat)
+    report("top_n", "groupby/sort/slice {:,} rows".format(len(noc)), seconds)
+    seconds = timed(lambda: top_n(noc, 20), args.repeat)
+    report("top_n", "top_n {:,} rows".format(len(noc)), seconds)
+    # the same with NOC loaded as a categorical column, i.e. factorized already
+    nocCategories = noc.astype('category')
+    seconds = timed(lambda: top_n(nocCategories, 20), args.repeat)
+    report("top_n", "top_n categorical {:,} rows".format(len(noc)), seconds)
+
+    expected = noc.groupby(noc).size().sort_values(ascending=False)
+    assert top_n(noc, 20).tolist() == expected[:20].tolist()
+    assert top_n(noc, 0).empty and top_n(nocCategories, 0).empty and top_n(noc, -1).empty
+
+
+# ### Crosstabs
+# The three crosstabs of the tips report (Visualizing_With_Pandas.py) and the medal crosstab of the Olympics report,
+# as separate pd.crosstab() calls and with one Aggregation_Helpers.crosstabs() call, at 10 million rows.
+
+def bench_crosstabs(args):
+    from Aggregation_Helpers import crosstabs
+
+    # one dataset at a time: 10 million rows of strings take a few GB while they are generated
+    for name, make_frame, pairs, margins in [("tips", make_synthetic_tips, [('day', 'time'), ('day', 'smoker'),
+                                                                           ('day', 'size')], False),
+                                             ("medals", make_synthetic_olympics, [('NOC', 'Medal')], True)]:
+        frame = make_frame(10000000)
+        seconds = timed(lambda: [pd.crosstab(frame[rows], frame[columns], margins=margins)
+                                 for rows, columns in pairs], args.repeat)
+        report("crosstabs", "{} pd.crosstab x{} {:,} rows".format(name, len(pairs), len(frame)), seconds)
+        seconds = timed(lambda: crosstabs(frame, pairs, margins), args.repeat)
+        report("crosstabs", "{} crosstabs {:,} rows".format(name, len(frame)), seconds)
+
+        for table, (rows, columns) in zip(crosstabs(frame, pairs, margins), pairs):
+            pd.testing.assert_frame_equal(table, pd.crosstab(frame[rows], frame[columns], margins=margins))
+        frame = None
+
+
+# ### Streaming counts
+# The counts of the Olympics report from the whole dataset in memory, and from chunks of rows read with
+# Dataset_Loader.read_chunks() into Aggregation_Helpers.StreamingCounts. A CSV file of --rows rows and a workbook of
+# --script-rows rows (writing big workbooks takes very long). The peak memory of the full read grows with the file,
+# the one of the streamed read with the chunk size only.
+
+def bench_olympics_stream(args):
+    from Aggregation_Helpers import StreamingCounts, crosstabs, top_n
+    from Dataset_Loader import read_chunks
+
+    def count_all(frame):
+        return top_n(frame['NOC'], 20), crosstabs(frame, [('NOC', 'Medal')], margins=True)[0]
+
+    def count_streaming(path):
+        counts = StreamingCounts(columns=['NOC'], pairs=[('NOC', 'Medal')])
+        for chunk in read_chunks(path, ['NOC', 'Medal'], 100000):
+            counts.update(chunk)
+        return counts.top_n('NOC', 20), counts.crosstab('NOC', 'Medal', margins=True)
+
+    with tempfile.TemporaryDirectory() as folder:
+        for nRows, extension, read in [(args.rows, "csv", pd.read_csv), (args.script_rows, "xlsx", pd.read_excel)]:
+            path = os.path.join(folder, "Olympics2016." + extension)
+            olympics = make_synthetic_olympics(nRows)
+            if extension == "csv":
+                olympics.to_csv(path, index=False)
+            else:
+                olympics.to_excel(path, index=False)
+            olympics = None
+
+            with PeakMemory() as memory:
+                start = time.perf_counter()
+                expected = count_all(read(path))
+                elapsed = time.perf_counter() - start
+            report("olympics_stream", "read whole {} {:,} rows".format(extension, nRows), elapsed, peakMB=memory.peakMB)
+
+            with PeakMemory() as memory:
+                start = time.perf_counter()
+                streamed = count_streaming(path)
+                elapsed = time.perf_counter() - start
+            report("olympics_stream", "streamed {} {:,} rows".format(extension, nRows), elapsed, peakMB=memory.peakMB)
+
+            pd.testing.assert_series_equal(streamed[0], expected[0])
+            pd.testing.assert_frame_equal(streamed[1], expected[1])
+
+
+# ### Column types
+# The synthetic datasets as pd.read_excel() types them and with the types of Dataset_Loader.SCHEMAS: the memory they
+# take, and the time of the groupby/crosstab calls the scripts make on them, at --rows rows.
+
+def bench_schema(args):
+    from Aggregation_Helpers import crosstabs
+    from Dataset_Loader import apply_schema
+
+    # dataset: (synthetic data, [(what the scripts do with it, function of the frame)])
+    datasets = {'AutoMPG': (make_synthetic_auto,
+                            [("groupby Origin_Country", lambda frame: frame.groupby('Origin_Country', observed=True).size()),
+                             ("unique Origin", lambda frame: frame['Origin'].unique())]),
+                'tips': (make_synthetic_tips,
+                         [("pd.crosstab day x3", lambda frame: [pd.crosstab(frame['day'], frame[column])
+                                                                for column in ('time', 'smoker', 'size')]),
+                          ("crosstabs day x3", lambda frame: crosstabs(frame, [('day', 'time'), ('day', 'smoker'),
+                                                                               ('day', 'size')]))]),
+                'Olympics2016': (make_synthetic_olympics,
+                                 [("groupby NOC", lambda frame: frame.groupby('NOC', observed=True).size()),
+                                  ("pd.crosstab NOC x Medal", lambda frame: pd.crosstab(frame['NOC'], frame['Medal'],
+                                                                                        margins=True))])}
+
+    for dataset, (make_frame, operations) in datasets.items():
+        frame = make_frame(args.rows)
+        typed = apply_schema(frame, dataset)
+        for types, data in (("as read", frame), ("schema", typed)):
+            memory = "frame {:,.0f} MB, {:,} rows".format(data.memory_usage(deep=True).sum() / 1e6, args.rows)
+            for name, operation in operations:
+                report("schema", "{} {} {}".format(dataset, types, name), timed(lambda: operation(data), args.repeat),
+                       memory)
+        frame = typed = data = None
+
+
+# ### Grid reports
+# A report job rendering the tips grid of Visualizing_With_Pandas.py again and again, with one of its four charts
+# showing other data every time (the tip histogram of another sample), into RGBA images. Redrawing the whole figure for
+# every grid against Mpl_Helpers.GridRenderer, which only draws the changed cell and blits the others from its cache.
+
+def bench_grid(args):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from Aggregation_Helpers import crosstabs
+    from Mpl_Helpers import GridRenderer, draw_cells
+    from Visualizing_With_Pandas import tips_cells
+
+    nGrids = 50
+    tips = make_synthetic_tips(2000)
+    dayCnt, smokeCnt, day = crosstabs(tips, [('day', 'time'), ('day', 'smoker'), ('day', 'size')])
+    tipPCT = tips['tip'] / tips['total_bill'] * 100
+    smokeDT = {'title': "# of smoking parties by day", 'xlabel': 'day of the week', 'ylabel': 'count'}
+    grids = [tips_cells(dayCnt, smokeCnt, tipPCT.sample(500, random_state=grid), day, smokeDT)
+             for grid in range(nGrids)]
+
+    def redraw_all():
+        figure = Figure(figsize=(10, 6))
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.subplots(2, 2, squeeze=False)
+        figure.subplots_adjust(wspace=.5, hspace=.5)
+        figure.suptitle("Analyzing tips dataset", fontsize=15)
+        for cells in grids:
+            for ax in axes.flat:
+                ax.cla()
+            draw_cells(axes, cells)
+            canvas.draw()
+            np.asarray(canvas.buffer_rgba())
+
+    renderers = []
+
+    def render_changed():
+        renderer = GridRenderer(2, 2, figsize=(10, 6), wspace=.5, hspace=.5)
+        renderers.append(renderer)
+        for cells in grids:
+            renderer.render(cells, title="Analyzing tips dataset")
+
+    seconds = timed(redraw_all, args.repeat)
+    report("grid", "redraw figure x{}".format(nGrids), seconds, "{:.1f} ms per grid".format(1000 * seconds / nGrids))
+    seconds = timed(render_changed, args.repeat)
+    report("grid", "GridRenderer x{}".format(nGrids), seconds,
+           "{:.1f} ms per grid, {} of {} cells drawn".format(1000 * seconds / nGrids, renderers[-1].cellsDrawn,
+                                                            4 * nGrids))
+
+
+# ### Teaching scripts
+# Each script is imported and its main() run end to end in a temporary folder holding synthetic copies of the
+# workbooks it reads: with the Agg backend, and with .show() doing nothing instead of starting a server. The scripts
+# share this process and its caches, like the apps in a served process. Afterwards the reactive plot functions are
+# timed with the plot caches cleared, i.e. as a first render.
+
+# benchmark: (script, keyword arguments of its main(), [(plot function, arguments)])
+SCRIPTS = {'static_mpl': ("Basic_Static_Visualization_With_Matplotlib.py", {}, []),
+           'two_ways': ("Two_Ways_To_Draw_In_Python.py", {}, []),
+           'tips': ("Visualizing_With_Pandas.py", {}, []),
+           # In_Class_Exercise.py reads the Olympics workbook from the author's drive by default
+           'olympics': ("In_Class_Exercise.py", {'path': "Olympics2016.xlsx"}, []),
+           'reactive_api': ("Panel_ReactiveAPI.py", {},
+                            [('react_mpl_plot', ('Weight', 'Horsepower', '#654321', 5)),
+                             ('react_mpl_plot_weight', ('Weight', 'Horsepower', '#654321')),
+                             ('react_mpl_plot_country', ('Weight', 'Horsepower', '#654321', [1, 3]))]),
+           'auto_bokeh': ("Panel_and_Bokeh.py", {},
+                          [('bokeh_plot', ('Horsepower', 'Acceleration', 'Displacement')),
+                           ('react_mpl_plot_weight', ('Horsepower', 'Acceleration')),
+                           ('react_pandasBokeh_plot_weight', ('Horsepower', 'Acceleration'))])}
+
+def write_workbooks(folder, nRows):
+    make_synthetic_auto(nRows).to_excel(os.path.join(folder, "AutoMPG.xlsx"), index=False)
+    make_synthetic_tips(nRows).to_excel(os.path.join(folder, "tips.xlsx"), index=False)
+    make_synthetic_olympics(nRows).to_excel(os.path.join(folder, "Olympics2016.xlsx"), index=False)
+
+
+# Runs the body of the with block headlessly (see above), in folder
+@contextlib.contextmanager
+def _headless(folder):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import panel as pn
+
+    show, cwd = pn.viewable.ServableMixin.show, os.getcwd()
+
+    pn.viewable.ServableMixin.show = lambda self, *args, **kwargs: None
+    os.chdir(folder)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.chdir(cwd)
+        pn.viewable.ServableMixin.show = show
+        plt.close('all')
+
+
+def bench_script(name, args):
+    import importlib
+    from Panel_Helpers import renderCache, renderQueue
+
+    script, mainArgs, plotFunctions = SCRIPTS[name]
+    moduleName = os.path.splitext(script)[0]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    try:
+        with open(path, encoding="utf-8") as file:
+            compile(file.read(), path, "exec")
+    except SyntaxError as error:
+        print("{:<12} skipped: {} is not valid Python ({})".format(name, script, error.msg))
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_workbooks(folder, args.script_rows)
+
+        try:
+            with _headless(folder), PeakMemory() as memory:
+                start = time.perf_counter()
+                # imported afresh, so that the import is timed as well
+                sys.modules.pop(moduleName, None)
+                module = importlib.import_module(moduleName)
+                module.main(**mainArgs)
+                # (coalesced() plots render their first result in the background)
+                wait_for_renders(renderQueue)
+                elapsed = time.perf_counter() - start
+        except ImportError as error:
+            print("{:<12} skipped: {} needs {}".format(name, script, error.name))
+            return
+        report(name, "run {}".format(script), elapsed, "{:,} rows".format(args.script_rows), memory.peakMB)
+
+        for function, values in plotFunctions:
+            def render():
+                renderCache.clear()
+                getattr(module, function)(*values)
+
+            with _headless(folder), PeakMemory() as memory:
+                seconds = timed(render, args.repeat)
+            report(name, function, seconds, peakMB=memory.peakMB)
+
+
+def _peak(result):
+    return "-" if result.get('peakMB') is None else "+{:.0f} MB".format(result['peakMB'])
+
+
+# Prints the ratio of every measurement to the same measurement in the baseline (and the peak memory of both), and
+# returns the ones that got slower than maxSlowdown
+def compare_to_baseline(baseline, maxSlowdown):
+    print("\n{:<48} {:>10} {:>10} {:>7}  {:>9} {:>9}".format("compared to baseline", "baseline", "now", "ratio",
+                                                            "peak was", "peak now"))
+    slower = []
+    for key, result in results.items():
+        if key not in baseline:
+            print("{:<48} {:>10} {:>9.4f}s {:>7}  {:>9} {:>9}".format(key, "-", result['seconds'], "new", "-",
+                                                                     _peak(result)))
+            continue
+        ratio = result['seconds'] / max(baseline[key]['seconds'], 1e-9)
+        print("{:<48} {:>9.4f}s {:>9.4f}s {:>6.2f}x  {:>9} {:>9}".format(key, baseline[key]['seconds'], result['seconds'],
+                                                                      ratio, _peak(baseline[key]), _peak(result)))
+        if ratio > maxSlowdown:
+            slower.append(key)
+    return slower
+
+
+BENCHMARKS = {'loader': bench_loader,
+              'mpl_soak': bench_mpl_soak,
+              'coalesce': bench_coalesce,
+              'density': bench_density,
+              'render_pool': bench_render_pool,
+              'stream': bench_stream,
+              'top_n': bench_top_n,
+              'crosstabs': bench_crosstabs,
+              'olympics_stream': bench_olympics_stream,
+              'schema': bench_schema,
+              'grid': bench_grid}
+BENCHMARKS.update({name: functools.partial(bench_script, name) for name in SCRIPTS})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the CIS4170 visualization scripts")
+    parser.add_argument('names', nargs='*', help="benchmarks to run, any of {} (default: all)".format(sorted(BENCHMARKS)))
+    parser.add_argument('--rows', type=int, default=1000000, help="rows in the synthetic datasets")
+    parser.add_argument('--repeat', type=int, default=3, help="repetitions per measurement (best is reported)")
+    parser.add_argument('--events', type=int, default=10000, help="widget events driven by the soak tests")
+    parser.add_argument('--sessions', type=int, default=30, help="open sessions in the streaming benchmark")
+    parser.add_argument('--max-rss-growth', type=float, default=20, help="allowed RSS growth (MB) in the soak tests")
+    parser.add_argument('--script-rows', type=int, default=20000, help="rows in the workbooks of the script benchmarks")
+    parser.add_argument('--save-baseline', metavar="FILE", help="write the measurements of this run to FILE")
+    parser.add_argument('--baseline', metavar="FILE", help="compare the measurements to the ones saved in FILE")
+    parser.add_argument('--max-slowdown', type=float, default=1.5,
+                        help="fail if a measurement takes this many times as long as in the baseline")
+    args = parser.parse_args()
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmark(s): {}".format(", ".join(sorted(unknown))))
+
+    for name in args.names or sorted(BENCHMARKS):
+        BENCHMARKS[name](args)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            slower = compare_to_baseline(json.load(file), args.max_slowdown)
+        if slower:
+            sys.exit("slower than {}x the baseline: {}".format(args.max_slowdown, ", ".join(slower)))
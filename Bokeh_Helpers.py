@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Helpers for building the bokeh plots of the Panel apps
+#
+# - A ColumnDataSource belongs to exactly one bokeh Document, i.e. to one browser session, so it can not be shared
+#   between sessions. What can be shared are the NumPy arrays inside it.
+#
+# - make_cds() builds a ColumnDataSource that holds only the columns a plot actually uses. The arrays come from a
+#   process-wide store, so a hundred sessions showing the same column all point at one array in memory.
+#
+# - Bokeh sends NumPy arrays to the browser as binary buffers, but only for dtypes that JavaScript has typed arrays
+#   for. int64 columns would silently fall back to (much larger) JSON lists, so they are stored as int32 or float64.
+#
+# - retarget_scatter() switches an existing scatter plot to other columns. Only a handful of properties change, so
+#   bokeh sends a small patch to the browser instead of replacing the whole plot.
+#
+# - If the data source already holds every column a widget can select, js_retarget_scatter() does the same switch
+#   in the browser, with a JavaScript callback on the widget: no Python runs, and the switched models are not sent
+#   back to the server (only the widget's own value is). The plot must then not be watching the widget from Python too
+#   (see LazyTabs.unwatch in Panel_Helpers.py).
+#
+# - For very large datasets (more than Raster_Helpers.DENSITY_THRESHOLD points in view) a DensityLayer shows a density
+#   image computed on the server instead of the individual markers, and switches back to real markers once the user
+#   has zoomed in far enough. The markers then come from a ViewportSource, which only holds the rows in view.
+#
+# - The rows in view are looked up in a GridIndex (see Raster_Helpers.py) built once per pair of x/y columns, and
+#   a little more than the view is sent, so that small pans do not need a new query at all. Points selected with the
+#   box/lasso tools are remembered by their row in the DataFrame, so they stay selected across pans and zooms.
+#
+# - A StreamedSource sends the rows appended to a DatasetStream (see Dataset_Loader.py) to the browser with
+#   ColumnDataSource.stream(), which only transfers the new rows instead of the whole data source.
+
+import threading
+import weakref
+
+import numpy as np
+from bokeh.events import RangesUpdate
+from bokeh.models import ColumnDataSource, Glyph
+
+import Raster_Helpers
+from Raster_Helpers import GridIndex, data_range, rasterize, shade
+
+# Part of the view added on every side when querying the rows in view
+VIEWPORT_MARGIN = 0.25
+
+# (id of the DataFrame, column name) -> read-only NumPy array, and (id of the DataFrame, (x, y)) -> GridIndex. Shared by
+# the sessions of the server, which may run on different threads. (An RLock, since grid_index() uses column_buffer().)
+_buffers = {}
+_buffersLock = threading.RLock()
+
+
+def _drop_buffers(frameId):
+    with _buffersLock:
+        for key in [key for key in _buffers if key[0] == frameId]:
+            del _buffers[key]
+
+
+# Returns the shared, read-only array for one column of a DataFrame
+def column_buffer(frame, column):
+    key = (id(frame), column)
+    with _buffersLock:
+        buffer = _buffers.get(key)
+        if buffer is not None:
+            return buffer
+
+        # Forget the arrays of a DataFrame once it is garbage collected (e.g. after the workbook was reloaded)
+        if not any(known[0] == key[0] for known in _buffers):
+            weakref.finalize(frame, _drop_buffers, key[0])
+
+        buffer = _browser_array(frame[column].to_numpy())
+        buffer.flags.writeable = False
+        _buffers[key] = buffer
+        return buffer
+
+
+# The values as an array that bokeh can send as a binary buffer
+def _browser_array(values):
+    if values.dtype == np.int64:
+        fitsInt32 = len(values) == 0 or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max)
+        return values.astype(np.int32 if fitsInt32 else np.float64)
+    if values.dtype == np.bool_:
+        return values.astype(np.uint8)
+    # Our own view of the column, so that making it read-only does not affect the DataFrame itself
+    return values.view()
+
+
+# Returns the shared spatial index over two columns of a DataFrame
+def grid_index(frame, x, y):
+    key = (id(frame), (x, y))
+    with _buffersLock:
+        index = _buffers.get(key)
+        if index is None:
+            index = _buffers[key] = GridIndex(column_buffer(frame, x), column_buffer(frame, y))
+        return index
+
+
+# Creates a ColumnDataSource with only the given columns of the DataFrame (duplicates are ignored)
+def make_cds(frame, columns):
+    data = {}
+    for column in columns:
+        if column not in data:
+            data[column] = column_buffer(frame, column)
+    return ColumnDataSource(data=data)
+
+
+# Points the glyphs of an existing renderer at other x/y columns, adding those columns to its data source if needed.
+# Pass start=0 to also restart both axes at 0 (the end of each axis is then recomputed from the new data).
+def retarget_scatter(fig, renderer, frame, x, y, start=None):
+    source = renderer.data_source
+    for column in (x, y):
+        if column not in source.data:
+            source.data[column] = column_buffer(frame, column)
+
+    # The selected/nonselected/muted looks of the markers are separate glyph objects with their own x and y
+    for glyph in (renderer.glyph, renderer.selection_glyph, renderer.nonselection_glyph,
+                  renderer.hover_glyph, renderer.muted_glyph):
+        if isinstance(glyph, Glyph):
+            glyph.update(x=x, y=y)
+
+    fig.xaxis.axis_label = x
+    fig.yaxis.axis_label = y
+
+    if start is not None:
+        for axisRange in (fig.x_range, fig.y_range):
+            axisRange.update(start=start, end=None)
+
+
+# Keeps a data source made (e.g. with make_cds) from a snapshot of a DatasetStream up to date with the rows appended to
+# the stream since, for the session of the bokeh Document doc. Old rows are dropped from the data source along with
+# the stream's rollover. mappers maps a column to the CategoricalColorMappers coloring by it (the 'transform' of a
+# factor_cmap), which learn about categories that only show up in appended rows.
+class StreamedSource:
+
+    def __init__(self, source, stream, frame, doc, mappers=None):
+        self.source = source
+        self.stream = stream
+        self.doc = doc
+        self.sent = stream.end_of(frame)
+        self.mappers = mappers or {}
+        for column in self.mappers:
+            stream.track_factors(column)
+
+        self._pending = False
+        self._lock = threading.Lock()
+        stream.subscribe(self._appended)
+        doc.on_session_destroyed(self._session_destroyed)
+
+    # Called by the stream, in whatever thread appended the rows. The rows are sent by a callback on the session's
+    # own thread, so all the appends made until it runs are sent with a single stream() call.
+    def _appended(self, stream):
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+        self.doc.add_next_tick_callback(self.flush)
+
+    def flush(self):
+        with self._lock:
+            self._pending = False
+
+        first, end, data = self.stream.rows(self.sent, list(self.source.data))
+        self.sent = end
+        if end > first:
+            self.source.stream({column: _browser_array(values) for column, values in data.items()},
+                               rollover=self.stream.rollover)
+
+        for column, mappers in self.mappers.items():
+            factors = self.stream.factors(column)
+            for mapper in mappers:
+                if len(factors) > len(mapper.factors):
+                    mapper.factors = factors
+
+    def _session_destroyed(self, context):
+        self.stream.unsubscribe(self._appended)
+
+
+# Runs in the browser when a column is selected (cb_obj.value). targets are [renderer name, figure name, range start]
+# triples; figures are only switched if they have the JS_AXES_TAG tag, i.e. if their data source has every column.
+# The models are changed silently, so that bokeh doesn't send the changes back to the server as a PATCH-DOC, and the
+# change signals the plot views listen to are emitted right here instead.
+_RETARGET_JS = """
+function set_here(model, attrs) {
+    model.setv(attrs, {silent: true})
+    for (const attr in attrs)
+        model.properties[attr].change.emit()
+    model.change.emit()
+}
+
+const column = cb_obj.value
+for (const [rendererName, figureName, start] of targets) {
+    const renderer = cb_obj.document.get_model_by_name(rendererName)
+    const fig = cb_obj.document.get_model_by_name(figureName)
+    if (renderer == null || fig == null || !fig.tags.includes(tag))
+        continue
+
+    for (const glyph of [renderer.glyph, renderer.selection_glyph, renderer.nonselection_glyph,
+                         renderer.hover_glyph, renderer.muted_glyph]) {
+        if (glyph instanceof Object && axis in glyph.properties)
+            set_here(glyph, {[axis]: {field: column}})
+    }
+    for (const axisModel of (axis == "x" ? fig.below : fig.left))
+        set_here(axisModel, {axis_label: column})
+
+    // fit the range to the new column like a DataRange1d would (5% padding on both sides), keeping a fixed start
+    let low = Infinity, high = -Infinity
+    for (const value of renderer.data_source.data[column]) {
+        if (isFinite(value)) {
+            low = Math.min(low, value)
+            high = Math.max(high, value)
+        }
+    }
+    if (low > high)
+        continue
+    const padding = 0.05 * ((high - low) || 1)
+    const range = axis == "x" ? fig.x_range : fig.y_range
+    set_here(range, {start: start != null ? start : low - padding, end: high + padding})
+}
+"""
+
+# Tag of the figures whose axes js_retarget_scatter() may switch
+JS_AXES_TAG = "js-axes"
+
+
+# Lets a Panel Select widget switch the given axis ('x' or 'y') of scatter renderers in the browser. targets is a list
+# of (renderer name, figure name, range start or None). The figures must be tagged with JS_AXES_TAG (fig.tags) and
+# their data source must hold every option of the widget; untagged figures are left to the Python callbacks. The
+# server keeps the columns the figures were built with, so a tagged figure must not be retargeted from Python as well.
+def js_retarget_scatter(widget, axis, targets):
+    return widget.jscallback(value=_RETARGET_JS, args={'axis': axis, 'targets': [list(target) for target in targets],
+                                                        'tag': JS_AXES_TAG})
+
+
+# The data source of scatter plots in aggregation mode. It only holds the rows that the DensityLayers using it
+# currently show as markers; plots sharing one ViewportSource therefore still get linked brushing between them.
+class ViewportSource:
+
+    def __init__(self, source, frame):
+        self.source = source
+        self.frame = frame
+        self.columns = list(source.data)
+        self.layers = []
+        self.rows = None
+        self.selectedRows = np.zeros(0, dtype=np.int64)
+        self._refreshing = False
+        source.selected.on_change('indices', self._selection_changed)
+        self.refresh()
+
+    # A selection made in the browser refers to positions in the data source; remember the rows behind them. Positions
+    # past the end of the data source are left out: they come from a selection made before the browser got the data
+    # of a refresh() that sent fewer rows.
+    def _selection_changed(self, attr, old, new):
+        if not self._refreshing:
+            positions = np.asarray(new, dtype=np.int64)
+            positions = positions[(positions >= 0) & (positions < len(self.rows))]
+            self.selectedRows = self.rows[positions]
+
+    # Puts the rows shown by any of the layers (and the given extra columns) into the data source
+    def refresh(self, columns=()):
+        for column in columns:
+            if column not in self.columns:
+                self.columns.append(column)
+
+        visible = [layer.rows for layer in self.layers if layer.rows is not None]
+        rows = np.unique(np.concatenate(visible)) if visible else np.zeros(0, dtype=np.int64)
+        if not any(column not in self.source.data for column in self.columns) and np.array_equal(rows, self.rows):
+            return
+
+        self._refreshing = True
+        try:
+            self.rows = rows
+            self.source.data = {column: column_buffer(self.frame, column)[rows] for column in self.columns}
+            # selected rows that are in the new data source (again) are shown as selected there
+            self.source.selected.indices = np.flatnonzero(np.isin(rows, self.selectedRows)).tolist()
+        finally:
+            self._refreshing = False
+
+
+# Shows the points of a scatter renderer as a density image while there are more than threshold of them in view
+# (Raster_Helpers.DENSITY_THRESHOLD unless given).
+# codes holds the category of every row (e.g. GroupIndex.codes) and colors the '#rrggbb' color of every category.
+# Every pan or zoom re-renders the image for the new view, or hands the points in view to the ViewportSource
+# (unless the rows sent for the previous view still cover the new one).
+class DensityLayer:
+
+    def __init__(self, fig, renderer, points, codes, colors, x, y, start=None, threshold=None):
+        self.fig = fig
+        self.renderer = renderer
+        self.points = points
+        self.codes = codes
+        self.colors = colors
+        self.start = start
+        self.threshold = Raster_Helpers.DENSITY_THRESHOLD if threshold is None else threshold
+        self.rows = None
+        self.queried = None
+
+        self.imageSource = ColumnDataSource(data={'image': [], 'x': [], 'y': [], 'dw': [], 'dh': []})
+        self.image = fig.image_rgba(image='image', x='x', y='y', dw='dw', dh='dh', source=self.imageSource)
+
+        # draw the density image below the markers
+        fig.renderers.remove(self.image)
+        fig.renderers.insert(0, self.image)
+
+        points.layers.append(self)
+        fig.on_event(RangesUpdate, self._ranges_updated)
+        self.set_columns(x, y)
+
+    # Switches the layer to other x/y columns, showing all of their data again
+    def set_columns(self, x, y):
+        self.x = x
+        self.y = y
+        self.viewport = None
+        self.queried = None
+        self.update()
+
+    def _ranges_updated(self, event):
+        self.viewport = ((event.x0, event.x1), (event.y0, event.y1))
+        self.update()
+
+    def update(self):
+        x = column_buffer(self.points.frame, self.x)
+        y = column_buffer(self.points.frame, self.y)
+
+        if self.viewport is None:
+            xRange, yRange = data_range(x, self.start), data_range(y, self.start)
+        else:
+            xRange, yRange = self.viewport
+
+        if self.queried is not None and _contains(self.queried, (xRange, yRange)):
+            return
+
+        queryRanges = tuple(_widen(axisRange, VIEWPORT_MARGIN) for axisRange in (xRange, yRange))
+        rows = grid_index(self.points.frame, self.x, self.y).query(*queryRanges, limit=self.threshold)
+        if rows is not None:
+            self.rows = rows
+            self.queried = queryRanges
+            self.imageSource.data = {'image': [], 'x': [], 'y': [], 'dw': [], 'dh': []}
+        else:
+            self.rows = None
+            self.queried = None
+            image = shade(rasterize(x, y, self.codes, len(self.colors), xRange, yRange), self.colors)
+            self.imageSource.data = {'image': [image.view(np.uint32).reshape(image.shape[:2])],
+                                     'x': [xRange[0]], 'y': [yRange[0]],
+                                     'dw': [xRange[1] - xRange[0]], 'dh': [yRange[1] - yRange[0]]}
+
+        self.renderer.visible = self.rows is not None
+        self.points.refresh([self.x, self.y])
+
+
+def _widen(axisRange, margin):
+    low, high = axisRange
+    return low - margin * (high - low), high + margin * (high - low)
+
+
+# True if the rectangle outer = (xRange, yRange) contains the rectangle inner
+def _contains(outer, inner):
+    return all(o[0] <= i[0] and i[1] <= o[1] for o, i in zip(outer, inner))
+
+
+# Adds a scatter plot of frame[x] against frame[y] in aggregation mode to fig: markers from a ViewportSource plus a
+# DensityLayer. columns are the extra columns the markers use (e.g. for their size); the rest goes to fig.scatter().
+def density_scatter(fig, frame, codes, colors, x, y, columns=(), start=None, **kwargs):
+    points = ViewportSource(make_cds(frame, [x, y] + list(columns)), frame)
+    renderer = fig.scatter(x, y, source=points.source, **kwargs)
+    return DensityLayer(fig, renderer, points, codes, colors, x, y, start=start)
@@ -0,0 +1,652 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Shared dataset loader for the Panel apps
+#
+# - `panel serve` re-executes the app script for every new browser session, so a plain pd.read_excel() at the top
+#   of the script parses the whole workbook with openpyxl again for every single visitor.
+#
+# - Modules imported by the script are only executed once per server process, so this module keeps one copy of
+#   each dataset in memory and hands the very same DataFrame to every session. Treat that frame as read-only:
+#   never add or overwrite columns on it inside a callback, since every other session is looking at it too.
+#
+# - The first time a workbook is loaded it is also converted into a typed columnar file (Parquet) inside a .cache
+#   folder next to it. A new server process then reads the Parquet file instead of parsing Excel again.
+#
+# - The cached file name contains a key built from the path, modification time and size of the workbook, so
+#   saving a new version of the workbook automatically triggers a fresh conversion.
+#
+# - group_index() precomputes, once per process, everything the plots need to draw a dataset one category at a time
+#   (e.g. one scatter per country): the category of every row, the list of categories, and the rows of each category.
+#   Its select() answers filters like "cars from countries 1 and 3" by OR-ing precomputed per-category bitmasks,
+#   instead of scanning the column with .isin() and copying the filtered DataFrame on every click.
+#
+# - Columns computed from other columns (e.g. marker sizes from Weight) are declared once with declare_column() and
+#   then computed on first use by derived_column(). The result is stored read-only and shared, so callbacks never
+#   have to add columns to the shared DataFrame (which would race with the callbacks of other sessions).
+#
+# - dataset_stream() turns a dataset into one that grows: new rows are appended to growable per-column arrays (no
+#   pd.concat of the whole frame per batch), missing columns that have a declared derivation (e.g. Weight_Size) are
+#   computed for the new rows only, and the list of categories of a column is extended as new ones show up.
+#   Listeners (e.g. the data sources of open sessions, see Bokeh_Helpers.StreamedSource) are told about every append,
+#   and load_dataset() hands new sessions a snapshot that includes the appended rows.
+#
+# - load_dataset_async() runs load_dataset() on a background thread and returns a Future, so that a served app can
+#   show its layout right away instead of blocking the server's event loop (and with it every other session) while
+#   the workbook is read. Sessions starting at the same time share one load.
+#
+# - read_chunks() is for reports that only aggregate a few columns of a file too big to hold in memory: it yields the
+#   file a chunk of rows at a time, with just those columns, and keeps nothing. Workbooks are read row by row with
+#   openpyxl's read-only mode (or from their columnar copy, if load_dataset() made one), CSV files with
+#   read_csv(chunksize=) and Parquet files one batch of a row group at a time.
+#
+# - Every loader (load_dataset(), read_dataset(), read_chunks()) gives the columns of a dataset the types in SCHEMAS.
+#   Text columns with a few distinct values (countries, days, medals) become categoricals: each value is stored once
+#   and every row only holds a small integer code, so groupby(), crosstab(), unique() and the color mapping of the
+#   plots work on the codes instead of hashing the same strings over and over. Small whole numbers (cylinders, party
+#   sizes) get the smallest integer type that holds them. The categories are sorted like the strings were, so every
+#   table and chart comes out in the same order as before.
+
+import hashlib
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Parquet needs pyarrow. Without it we still get the cache, just stored as a pickle file instead.
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pkl"
+
+CACHE_DIR = ".cache"
+
+# Column types by dataset (the file name without its extension): 'category', or 'integer' for the smallest integer
+# type holding all the values (only when none of them is missing). Columns a file doesn't have are skipped.
+SCHEMAS = {'AutoMPG': {'Origin': 'category', 'Origin_Country': 'category', 'Cylinder': 'integer'},
+           'tips': {'sex': 'category', 'smoker': 'category', 'day': 'category', 'time': 'category',
+                    'size': 'integer'},
+           'Olympics2016': {'Sex': 'category', 'NOC': 'category', 'Season': 'category', 'Sport': 'category',
+                            'Medal': 'category'}}
+
+# Columns with up to this many categories get one bitmask per category for GroupIndex.select(). With more categories
+# the bitmasks would take too much memory (rows/8 bytes each), and select() joins the rows of the categories instead.
+BITMASK_CATEGORIES = 64
+
+# path -> (source key, DataFrame). One entry per workbook for the whole server process.
+_frames = {}
+_lock = threading.Lock()
+
+# path -> lock held while that file is read, so that it is only read once at a time
+_pathLocks = {}
+
+# (id of the DataFrame, column) -> GroupIndex
+_indexes = {}
+
+# name -> function computing the derived column from a DataFrame
+_derivations = {}
+
+# (id of the DataFrame, name or tuple of names) -> read-only array / DataFrame with derived columns
+_derived = {}
+_derivedLock = threading.RLock()
+
+# path -> DatasetStream
+_streams = {}
+
+# path -> Future of a load_dataset_async() that has not finished yet
+_loading = {}
+_loader = ThreadPoolExecutor(max_workers=4, thread_name_prefix="load")
+
+
+# Builds a short key that changes whenever the workbook on disk changes
+def source_key(path):
+    stat = os.stat(path)
+    key = "{}|{}|{}".format(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+# Location of the columnar copy of the workbook, e.g. .cache/AutoMPG.xlsx.3f2a9c0d1e4b5a67.parquet. The name of the
+# source file is kept whole, so that AutoMPG.xlsx, AutoMPG.csv and AutoMPG.v2.xlsx each get copies of their own.
+def cache_path(path, key):
+    folder = os.path.join(os.path.dirname(path) or ".", CACHE_DIR)
+    return os.path.join(folder, "{}.{}.{}".format(os.path.basename(path), key, CACHE_FORMAT))
+
+
+# Matches the names of all the columnar copies of the file at path (of any version of it), and no others
+def _cache_name_pattern(path):
+    return re.compile(r"^{}\.[0-9a-f]{{16}}\.{}$".format(re.escape(os.path.basename(path)), re.escape(CACHE_FORMAT)))
+
+
+def dataset_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# Returns frame with the column types SCHEMAS declares for the dataset (frame itself if they all have them already)
+def apply_schema(frame, dataset):
+    typed = {}
+    for column, kind in SCHEMAS.get(dataset, {}).items():
+        if column not in frame:
+            continue
+        values = frame[column]
+        if kind == 'category':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                typed[column] = values.astype('category')
+        elif kind == 'integer':
+            if values.dtype.kind in 'iuf' and values.notna().all():
+                downcast = pd.to_numeric(values, downcast='integer')
+                if downcast.dtype != values.dtype and downcast.dtype.kind in 'iu':
+                    typed[column] = downcast
+        else:
+            raise ValueError("unknown column type {!r} for {}.{}".format(kind, dataset, column))
+    return frame.assign(**typed) if typed else frame
+
+
+def _read_cache(cachePath):
+    if CACHE_FORMAT == "parquet":
+        return pd.read_parquet(cachePath)
+    return pd.read_pickle(cachePath)
+
+
+# Parses the workbook once and writes the columnar copy, removing copies made from older versions of the workbook
+def convert_to_columnar(path, key):
+    frame = apply_schema(pd.read_excel(path), dataset_name(path))
+
+    cachePath = cache_path(path, key)
+    folder = os.path.dirname(cachePath)
+    os.makedirs(folder, exist_ok=True)
+
+    # Write to a temporary name first so that another process never reads a half written file
+    tmpPath = "{}.{}.tmp".format(cachePath, os.getpid())
+    if CACHE_FORMAT == "parquet":
+        frame.to_parquet(tmpPath, index=False)
+    else:
+        frame.to_pickle(tmpPath)
+    os.replace(tmpPath, cachePath)
+
+    pattern = _cache_name_pattern(path)
+    for name in os.listdir(folder):
+        stale = os.path.join(folder, name)
+        if pattern.match(name) and stale != cachePath:
+            os.remove(stale)
+
+    return frame
+
+
+# Returns the shared DataFrame for a workbook, reading it from (in order of preference) memory, the columnar
+# cache, or the workbook itself
+def load_dataset(path):
+    key = source_key(path)
+
+    with _lock:
+        stream = _streams.get(path)
+        cached = _frames.get(path)
+        if stream is None and cached is not None and cached[0] == key:
+            return cached[1]
+        pathLock = _pathLocks.setdefault(path, threading.Lock())
+    if stream is not None:
+        return stream.snapshot()
+
+    # The file is read under the lock of its path only: sessions loading the same file wait for one read, while
+    # _lock (and with it dataset_version(), group_index() and load_dataset_async()) is never held during the read
+    with pathLock:
+        with _lock:
+            cached = _frames.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+        cachePath = cache_path(path, key)
+        if os.path.exists(cachePath):
+            # (copies cached before the column had a type in SCHEMAS get it now)
+            frame = apply_schema(_read_cache(cachePath), dataset_name(path))
+        else:
+            frame = convert_to_columnar(path, key)
+
+        with _lock:
+            _frames[path] = (key, frame)
+        return frame
+
+
+def _load_finished(path, future):
+    with _lock:
+        if _loading.get(path) is future:
+            del _loading[path]
+
+
+# Returns a concurrent.futures.Future of load_dataset(path), loaded on a background thread. In asyncio code (e.g. an
+# async callback of a served app) it can be awaited with asyncio.wrap_future().
+def load_dataset_async(path):
+    with _lock:
+        future = _loading.get(path)
+        if future is None:
+            future = _loading[path] = _loader.submit(load_dataset, path)
+            future.add_done_callback(lambda done: _load_finished(path, done))
+        return future
+
+
+# Reads a whole .xlsx, .csv or .parquet file into a DataFrame of its own (unlike the shared one of load_dataset(),
+# scripts may add columns to it), with the column types of SCHEMAS
+def read_dataset(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        frame = pd.read_csv(path)
+    elif extension == ".parquet":
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_excel(path)
+    return apply_schema(frame, dataset_name(path))
+
+
+# Rows per chunk of read_chunks()
+CHUNK_ROWS = 100000
+
+
+def _excel_chunks(path, columns, chunkRows):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise KeyError("{} has no column {}".format(path, ", ".join(missing)))
+        positions = [header.index(column) for column in columns]
+
+        chunk = []
+        for row in rows:
+            chunk.append([row[position] if position < len(row) else None for position in positions])
+            if len(chunk) == chunkRows:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _parquet_chunks(path, columns, chunkRows):
+    import pyarrow.parquet
+
+    with pyarrow.parquet.ParquetFile(path) as parquet:
+        for batch in parquet.iter_batches(batch_size=chunkRows, columns=columns):
+            yield batch.to_pandas()
+
+
+# Yields DataFrames of up to chunkRows rows with the given columns of an .xlsx, .csv or .parquet file, one after the
+# other, so that the whole file never has to be in memory
+def read_chunks(path, columns, chunkRows=CHUNK_ROWS):
+    columns = list(columns)
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".csv":
+        chunks = pd.read_csv(path, usecols=columns, chunksize=chunkRows)
+    elif extension == ".parquet":
+        chunks = _parquet_chunks(path, columns, chunkRows)
+    else:
+        cachePath = cache_path(path, source_key(path))
+        if CACHE_FORMAT == "parquet" and os.path.exists(cachePath):
+            chunks = _parquet_chunks(cachePath, columns, chunkRows)
+        else:
+            chunks = _excel_chunks(path, columns, chunkRows)
+
+    dataset = dataset_name(path)
+    for chunk in chunks:
+        yield apply_schema(chunk, dataset)
+
+
+# Returns the version (source key) of a DataFrame handed out by load_dataset(), e.g. for use in cache keys.
+# Frames that did not come from load_dataset() have no version and get None.
+def dataset_version(frame):
+    with _lock:
+        for key, known in _frames.values():
+            if known is frame:
+                return key
+        streams = list(_streams.values())
+    for stream in streams:
+        version = stream.version_of(frame)
+        if version is not None:
+            return version
+    return None
+
+
+# Rows of a DataFrame grouped by the values of one column, computed once instead of on every groupby()
+class GroupIndex:
+
+    def __init__(self, column):
+        # codes[i] is the position of row i's value in factors (-1 for missing values, which are left out like groupby does)
+        self.codes, factors = pd.factorize(column)
+
+        # factors are in order of first appearance, i.e. the same order as column.unique()
+        self.factors = list(factors)
+
+        # rows[k] holds the row positions of factors[k]
+        order = np.argsort(self.codes, kind='stable')
+        bounds = np.searchsorted(self.codes[order], np.arange(len(self.factors) + 1))
+        self.rows = [order[bounds[k]:bounds[k + 1]] for k in range(len(self.factors))]
+
+        # groupby() visits the groups in sorted order, keep that order for drawing (legend entries, colors)
+        self.sortedOrder = sorted(range(len(self.factors)), key=lambda k: self.factors[k])
+
+        self._splits = {}
+        self._lock = threading.Lock()
+
+        self._positions = {factor: k for k, factor in enumerate(self.factors)}
+        self._bitmasks = None
+        self._selections = OrderedDict()
+
+    # Splits values into one array per category (aligned with factors). When a name is given the result is kept and
+    # shared, so derived values like marker sizes are only split once.
+    def split(self, values, name=None):
+        if name is not None and name in self._splits:
+            return self._splits[name]
+
+        values = np.asarray(values)
+        parts = [values[rows] for rows in self.rows]
+        for part in parts:
+            part.flags.writeable = False
+
+        if name is not None:
+            with self._lock:
+                parts = self._splits.setdefault(name, parts)
+        return parts
+
+    # Returns the (sorted, read-only) row positions of the rows in any of the given categories, like
+    # np.flatnonzero(column.isin(categories)). The most recently used selections are kept.
+    def select(self, categories):
+        key = frozenset(categories)
+        with self._lock:
+            if key in self._selections:
+                self._selections.move_to_end(key)
+                return self._selections[key]
+
+        positions = sorted(self._positions[category] for category in key if category in self._positions)
+        if not positions:
+            rows = np.zeros(0, dtype=np.int64)
+        elif len(self.factors) <= BITMASK_CATEGORIES:
+            # one bit per row and category: OR the bitmasks of the selected categories, 8 rows per byte
+            combined = np.bitwise_or.reduce(self._category_bitmasks()[positions], axis=0)
+            rows = np.flatnonzero(np.unpackbits(combined, count=len(self.codes)))
+        else:
+            rows = np.sort(np.concatenate([self.rows[k] for k in positions]))
+        rows.flags.writeable = False
+
+        with self._lock:
+            self._selections[key] = rows
+            if len(self._selections) > 64:
+                self._selections.popitem(last=False)
+        return rows
+
+    def _category_bitmasks(self):
+        if self._bitmasks is None:
+            self._bitmasks = np.stack([np.packbits(self.codes == k) for k in range(len(self.factors))])
+        return self._bitmasks
+
+    # Same as iterating over groupby(): yields (category, values of that category) in sorted category order
+    def groups(self, values, name=None):
+        parts = self.split(values, name)
+        for k in self.sortedOrder:
+            yield self.factors[k], parts[k]
+
+
+def _drop_indexes(frameId):
+    with _lock:
+        for key in [key for key in _indexes if key[0] == frameId]:
+            del _indexes[key]
+
+
+# Returns the shared GroupIndex of a DataFrame column, building it the first time it is asked for
+def group_index(frame, column):
+    key = (id(frame), column)
+    with _lock:
+        index = _indexes.get(key)
+        if index is None:
+            if not any(known[0] == key[0] for known in _indexes):
+                weakref.finalize(frame, _drop_indexes, key[0])
+            index = _indexes[key] = GroupIndex(frame[column])
+        return index
+
+
+# Whether two functions compute the same thing: the same bytecode (wherever it was written) with the same closure
+# values, like the function a script declares again for every session it is executed for
+def _same_computation(first, second):
+    if first is second:
+        return True
+    code = lambda func: (func.__code__.co_code, func.__code__.co_consts, func.__code__.co_names)
+    if not (hasattr(first, '__code__') and hasattr(second, '__code__')) or code(first) != code(second):
+        return False
+    cells = lambda func: tuple(cell.cell_contents for cell in func.__closure__ or ())
+    try:
+        return bool(cells(first) == cells(second))
+    except (ValueError, TypeError):
+        return False
+
+
+# Declares how a derived column is computed, e.g. declare_column('wt_size', lambda frame: frame.Weight/300).
+# Scripts are re-executed for every session, so declaring a name again with the same computation keeps the first
+# declaration; declaring it with a different one raises a ValueError, since the values already computed (and shared)
+# would no longer match the declaration.
+def declare_column(name, compute):
+    with _derivedLock:
+        declared = _derivations.setdefault(name, compute)
+        if not _same_computation(declared, compute):
+            raise ValueError("derived column {!r} is already declared with a different computation".format(name))
+
+
+def _drop_derived(frameId):
+    with _derivedLock:
+        for key in [key for key in _derived if key[0] == frameId]:
+            del _derived[key]
+
+
+def _remember(frame, key, value):
+    if not any(known[0] == key[0] for known in _derived):
+        weakref.finalize(frame, _drop_derived, key[0])
+    _derived[key] = value
+    return value
+
+
+# Returns the derived column of a DataFrame as a read-only NumPy array, computing it the first time it is asked for
+def derived_column(frame, name):
+    key = (id(frame), name)
+    with _derivedLock:
+        values = _derived.get(key)
+        if values is None:
+            # view() so that making the result read-only never affects an array owned by the DataFrame itself
+            values = np.asarray(_derivations[name](frame)).view()
+            values.flags.writeable = False
+            _remember(frame, key, values)
+        return values
+
+
+# Returns a shared DataFrame with the given columns of frame (all of them by default) plus the given derived columns,
+# for plotting libraries such as pandas_bokeh that only accept column names of the DataFrame they plot. It is built
+# once per set of columns and names, and only copies the columns asked for.
+def derived_frame(frame, names, columns=None):
+    columns = tuple(dict.fromkeys(frame.columns if columns is None else columns))
+    key = (id(frame), columns, tuple(names))
+    with _derivedLock:
+        extended = _derived.get(key)
+        if extended is None:
+            data = {column: frame[column] for column in columns}
+            data.update((name, pd.Series(derived_column(frame, name), index=frame.index)) for name in names)
+            extended = _remember(frame, key, pd.DataFrame(data))
+        return extended
+
+
+def _fits(values, dtype):
+    info = np.iinfo(dtype)
+    return values.min() >= info.min and values.max() <= info.max
+
+
+# A dataset that rows can be appended to while the server is running. Appended rows must have the columns of the
+# dataset, except for derived columns (see declare_column) of the same name, which are computed from the new rows.
+# With a rollover only the last rollover rows are kept. Rows are counted from the first row of the original dataset,
+# so positions stay valid when old rows are dropped: the stream holds rows start..end-1.
+class DatasetStream:
+
+    def __init__(self, frame, version, rollover=None):
+        self.baseVersion = version
+        self.rollover = rollover
+        self.names = list(frame.columns)
+        self.appended = 0
+        self.start = 0
+        self.end = len(frame)
+
+        # the rows start..end-1 are _columns[name][_offset:_offset + end - start]. Rows are only ever written behind
+        # the last row, and growing the arrays copies them, so arrays handed out by rows() never change afterwards.
+        self._columns = {name: frame[name].to_numpy(copy=True) for name in self.names}
+        self._offset = 0
+
+        # categorical columns (see SCHEMAS) are kept as arrays of their values, and snapshots get them as categoricals
+        # again -- with the categories of the appended rows added
+        self._categorical = [name for name in self.names if isinstance(frame[name].dtype, pd.CategoricalDtype)]
+
+        self._factors = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+        # id of a snapshot DataFrame -> (version, end) of the stream when it was taken
+        self._snapshots = {}
+        self._latest = None
+        self._remember_snapshot(frame)
+
+    def version(self):
+        return self.baseVersion if self.appended == 0 else "{}+{}".format(self.baseVersion, self.appended)
+
+    def _remember_snapshot(self, frame):
+        self._snapshots[id(frame)] = (self.version(), self.end)
+        weakref.finalize(frame, self._snapshots.pop, id(frame), None)
+        self._latest = (self.end, frame)
+
+    # Version of a DataFrame returned by snapshot(), or None
+    def version_of(self, frame):
+        with self._lock:
+            return self._snapshots.get(id(frame), (None, None))[0]
+
+    # The end of the stream at the time the snapshot frame was taken, i.e. the first row it does not contain
+    def end_of(self, frame):
+        with self._lock:
+            if id(frame) not in self._snapshots:
+                raise ValueError("the DataFrame is not a snapshot of this stream")
+            return self._snapshots[id(frame)][1]
+
+    # Returns the rows start..end-1 as a DataFrame; the same one until rows are appended
+    def snapshot(self):
+        with self._lock:
+            if self._latest is None or self._latest[0] != self.end:
+                _, _, data = self._rows(self.start, self.names)
+                frame = pd.DataFrame(data)
+                frame = frame.assign(**{name: frame[name].astype('category') for name in self._categorical})
+                self._remember_snapshot(frame)
+            return self._latest[1]
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    # Keeps the categories of column in order of first appearance from now on (see factors)
+    def track_factors(self, column):
+        with self._lock:
+            if column not in self._factors:
+                factors = [value for value in pd.unique(self._rows(self.start, [column])[2][column]) if not pd.isna(value)]
+                self._factors[column] = (factors, {value: k for k, value in enumerate(factors)})
+
+    # The categories of a tracked column, including those of rows that have since been dropped by the rollover
+    def factors(self, column):
+        with self._lock:
+            return list(self._factors[column][0])
+
+    def _rows(self, since, columns):
+        first = max(since, self.start)
+        begin = self._offset + first - self.start
+        end = self._offset + self.end - self.start
+        data = {}
+        for name in columns:
+            data[name] = self._columns[name][begin:end]
+            data[name].flags.writeable = False
+        return first, self.end, data
+
+    # Returns (first, end, {column: values}) with the rows from since (or the oldest row still kept) to the end
+    def rows(self, since, columns):
+        with self._lock:
+            return self._rows(since, columns)
+
+    def _reserve(self, count):
+        length = self.end - self.start
+        capacity = len(next(iter(self._columns.values())))
+        if self._offset + length + count <= capacity:
+            return
+
+        # doubling the size keeps appending a few rows at a time at constant cost per row
+        newCapacity = max(2 * (length + count), 1024)
+        for name, values in self._columns.items():
+            grown = np.empty(newCapacity, dtype=values.dtype)
+            grown[:length] = values[self._offset:self._offset + length]
+            self._columns[name] = grown
+        self._offset = 0
+
+    # Appends rows (a DataFrame, or anything pd.DataFrame() accepts such as a dict of columns or a list of records)
+    # and tells the listeners about it. Can be called from any thread.
+    def append(self, rows):
+        new = pd.DataFrame(rows)
+        for name in self.names:
+            if name not in new and name in _derivations:
+                new[name] = _derivations[name](new)
+        missing = [name for name in self.names if name not in new]
+        if missing:
+            raise ValueError("the appended rows have no {} column(s)".format(", ".join(missing)))
+        if len(new) == 0:
+            return
+
+        with self._lock:
+            self._reserve(len(new))
+            at = self._offset + self.end - self.start
+            for name, values in self._columns.items():
+                newValues = new[name].to_numpy()
+                # a column SCHEMAS made small (e.g. int8) grows to the type of new values it can't hold
+                if values.dtype.kind in 'iu' and newValues.dtype.kind in 'iu' and not _fits(newValues, values.dtype):
+                    values = self._columns[name] = values.astype(np.promote_types(values.dtype, newValues.dtype))
+                values[at:at + len(new)] = newValues.astype(values.dtype, copy=False)
+            self.end += len(new)
+            self.appended += len(new)
+
+            for column, (factors, lookup) in self._factors.items():
+                for value in pd.unique(new[column]):
+                    if not pd.isna(value) and value not in lookup:
+                        lookup[value] = len(factors)
+                        factors.append(value)
+
+            if self.rollover is not None and self.end - self.start > self.rollover:
+                dropped = self.end - self.start - self.rollover
+                self.start += dropped
+                self._offset += dropped
+
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener(self)
+
+
+# Returns the shared DatasetStream of a workbook, creating it from load_dataset(path) the first time. From then on
+# load_dataset(path) returns snapshots of the stream. The rollover only applies when the stream is created.
+def dataset_stream(path, rollover=None):
+    with _lock:
+        stream = _streams.get(path)
+    if stream is not None:
+        return stream
+
+    frame = load_dataset(path)
+    version = dataset_version(frame)
+    with _lock:
+        return _streams.setdefault(path, DatasetStream(frame, version, rollover))
@@ -5,48 +5,84 @@
 # How many medals for each country? Can you create a breakdown based on the type of medal? 
 
 
-get_ipython().run_line_magic('matplotlib', 'inline')
-get_ipython().run_line_magic('matplotlib', 'notebook')
-
+import argparse
+import os
 
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+# The %matplotlib notebook magic only applies in Jupyter (see Notebook_Helpers.py). Importing this script draws
+# nothing: running it (or the notebook) calls main().
+from Notebook_Helpers import use_notebook_backend
+
+# top_n() counts the rows per country and keeps the 20 largest counts without sorting all of them
+from Aggregation_Helpers import top_n, crosstabs, StreamingCounts
+# read_dataset() and read_chunks() load NOC, Medal etc. as categoricals (see SCHEMAS in Dataset_Loader.py)
+from Dataset_Loader import read_chunks, read_dataset
+
+# The dataset (.xlsx, .csv or .parquet): the OLYMPICS_PATH environment variable, or the path given to main() or on the
+# command line (python In_Class_Exercise.py Olympics2016.xlsx)
+OLYMPICS_PATH = os.environ.get("OLYMPICS_PATH", r"D:\2022Fall\Data Visualization\Olympics2016.xlsx")
+
+
+# Both charts only count rows by NOC and Medal. With chunkRows the dataset is read that many rows at a time and only
+# the counts are kept, so a file of any size fits in memory (python In_Class_Exercise.py --chunk-rows 100000).
+def count_streaming(path, chunkRows):
+    olyCounts = StreamingCounts(columns=['NOC'], pairs=[('NOC', 'Medal')])
+    for chunk in read_chunks(path, ['NOC', 'Medal'], chunkRows):
+        olyCounts.update(chunk)
+    return olyCounts.top_n('NOC', 20), olyCounts.crosstab('NOC', 'Medal', margins=True)
+
+
+def main(path=OLYMPICS_PATH, chunkRows=None):
+    use_notebook_backend()
 
-olyDF = pd.read_excel(r"D:\2022Fall\Data Visualization\Olympics2016.xlsx")
-olyDF
+    olyFig, olyGrid = plt.subplots(2, figsize=(30,18))
+    olyFig.suptitle("Analyzing 2016Olympics dataset", fontsize=15)
+    olyFig.subplots_adjust(wspace=.5, hspace=.5)
 
-olyFig, olyGrid = plt.subplots(2, figsize=(30,18))
-olyFig.suptitle("Analyzing 2016Olympics dataset", fontsize=15)
-olyFig.subplots_adjust(wspace=.5, hspace=.5)
+    if chunkRows:
+        atheletsCnt_S2, medalCnt = count_streaming(path, chunkRows)
+    else:
+        olyDF = read_dataset(path)
+        print(olyDF)
 
+        # atheletsCnt = olyDF.groupby(by='NOC').size()
+        # atheletsCnt_S1 = atheletsCnt.sort_values()
+        # atheletsCnt_S1[-21:-1] would leave out the country with the most athelets
 
-atheletsCnt = olyDF.groupby(by='NOC').size()
-atheletsCnt_S = atheletsCnt.iloc[0:]
-atheletsCnt_S1 = atheletsCnt_S.sort_values()
-print(atheletsCnt_S1)
+        # athCNT = oDF.groupby(['Team']['ID']).nunique().nlargest(20).reset_index()
+        # athCNT
 
-# athCNT = oDF.groupby(['Team']['ID']).nunique().nlargest(20).reset_index()
-# athCNT
 
+        # The top 20 countries, most athelets first
+        atheletsCnt_S2 = top_n(olyDF['NOC'], 20)
 
-atheletsCnt_S2 = atheletsCnt_S1[-21:-1]
-print(atheletsCnt_S2)
+        # medalCnt = pd.crosstab(olyDF.NOC, olyDF.Medal, margins=True).reset_index().sort_values(by="All")
+        medalCnt = crosstabs(olyDF, [('NOC', 'Medal')], margins=True)[0]
 
+    print(atheletsCnt_S2)
 
-atheletsCnt_S2.plot.barh(ax=olyGrid[0], title="# of athelets by countries") 
 
-print(atheletsCnt_S2)
+    # reversed for barh(), which draws the first bar at the bottom
+    atheletsCnt_S2[::-1].plot.barh(ax=olyGrid[0], title="# of athelets by countries") 
 
 
-# medalCnt = pd.crosstab(olyDF.NOC, olyDF.Medal, margins=True).reset_index().sort_values(by="All")
-# print(medalCnt)
+    # The 20 countries with the most medals (the 'All' column, without the 'All' row), in the same order as
+    # sort_values(by="All") -- with the largest at the top of the chart
+    medalTotals = medalCnt['All'].drop('All')
+    medalTop = top_n(medalTotals.index, 20, weights=medalTotals.to_numpy())
+    medalCnt1 = medalCnt.loc[medalTop.index[::-1]]
+    print(medalCnt1)
 
 
-medalCnt1 = pd.crosstab(olyDF.NOC, olyDF.Medal, margins=True).sort_values(by="All")
-print(medalCnt1)
-type(medalCnt1)
+    medalCnt1.plot.barh(ax=olyGrid[1], title="# of medals(breakdown) by countries")
 
 
-medalCnt1[-21:-1].plot.barh(ax=olyGrid[1], title="# of medals(breakdown) by countries")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Athletes and medals by country")
+    parser.add_argument('path', nargs='?', default=OLYMPICS_PATH, help="the dataset (default: %(default)s)")
+    parser.add_argument('--chunk-rows', type=int, default=None, help="read the dataset this many rows at a time")
+    args = parser.parse_args()
+    main(args.path, args.chunk_rows)
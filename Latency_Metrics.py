@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Where the time goes when a user changes a widget of the Panel apps
+#
+# Serve the apps with a /metrics endpoint (in Prometheus' text format) with
+# >   python Latency_Metrics.py Panel_and_Bokeh.py Panel_ReactiveAPI.py --port 5006
+#
+# - @instrumented goes between @pn.depends and the function (above @memoize_png/@memoize_bokeh, so that cache hits are
+#   counted as well) and records how long every call takes, per function.
+#
+# - Inside the function (or anything it calls), `with stage('draw'):` records the time spent in that stage of the
+#   call, e.g. data prep, drawing or PNG encoding. Stages outside of an instrumented call are not recorded, so helper
+#   modules can mark their stages unconditionally (@staged('draw') marks a whole function).
+#
+# - Turning the bokeh models into JSON and writing them to the websocket happens after the function has returned, on
+#   the server's next tick. instrument_bokeh_server() (done by the launcher below) times every PATCH-DOC message
+#   ('serialize') and every websocket frame ('send'), and books them to the instrumented function that ran last in
+#   the same session. Calls made on another thread (e.g. the renders of Panel_Helpers.coalesced) are booked to the
+#   session they were queued from, via session_document().
+#
+# - Calls slower than SLOW_CALL seconds can be profiled: with PROFILER = "cProfile" (or "pyinstrument", if installed)
+#   every call runs under the profiler, and the profiles of the slow ones are written to PROFILE_DIR.
+#
+# - The histograms are kept per server process, with the same buckets for every function and stage, and only hold
+#   counts -- so they cost the same after a million calls as after the first one.
+
+import argparse
+import bisect
+import contextlib
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+import weakref
+
+import panel as pn
+
+# Upper bounds of the histogram buckets in seconds (the last bucket, +Inf, takes everything slower)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Calls taking longer than this many seconds are slow ones
+SLOW_CALL = 0.5
+
+# None, "cProfile" or "pyinstrument": the profiler calls run under, keeping the profiles of slow calls only
+PROFILER = None
+PROFILE_DIR = os.path.join(".cache", "profiles")
+
+
+class LatencyHistogram:
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class LatencyMetrics:
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.slowCalls = {}
+        self._collectors = []
+
+    def observe(self, function, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get((function, stage))
+            if histogram is None:
+                histogram = self._histograms[(function, stage)] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def slow_call(self, function):
+        with self._lock:
+            self.slowCalls[function] = self.slowCalls.get(function, 0) + 1
+
+    # {(function, stage): (count, sum, counts per bucket)}
+    def snapshot(self):
+        with self._lock:
+            return {key: (histogram.count, histogram.sum, list(histogram.counts))
+                    for key, histogram in self._histograms.items()}
+
+    # Exports the values other modules keep (e.g. cache counters) along with the histograms: collect() returns
+    # {metric name: value}, and names ending in _total are counters, all others gauges
+    def add_collector(self, collect, help=""):
+        with self._lock:
+            self._collectors.append((collect, help))
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self.slowCalls.clear()
+
+    # The histograms in Prometheus' text exposition format
+    def prometheus(self):
+        lines = ["# HELP panel_callback_seconds Time spent per call of a reactive function, by stage",
+                 "# TYPE panel_callback_seconds histogram"]
+        for (function, stage), (count, total, counts) in sorted(self.snapshot().items()):
+            labels = 'function="{}",stage="{}"'.format(function, stage)
+            cumulative = 0
+            for bound, bucketCount in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += bucketCount
+                lines.append('panel_callback_seconds_bucket{{{},le="{}"}} {}'.format(labels, bound, cumulative))
+            lines.append('panel_callback_seconds_sum{{{}}} {}'.format(labels, total))
+            lines.append('panel_callback_seconds_count{{{}}} {}'.format(labels, count))
+
+        lines += ["# HELP panel_callback_slow_calls_total Calls that took longer than {} s".format(SLOW_CALL),
+                  "# TYPE panel_callback_slow_calls_total counter"]
+        with self._lock:
+            slowCalls = sorted(self.slowCalls.items())
+        for function, count in slowCalls:
+            lines.append('panel_callback_slow_calls_total{{function="{}"}} {}'.format(function, count))
+
+        with self._lock:
+            collectors = list(self._collectors)
+        for collect, help in collectors:
+            for name, value in sorted(collect().items()):
+                lines += ["# HELP {} {}".format(name, help),
+                          "# TYPE {} {}".format(name, "counter" if name.endswith("_total") else "gauge"),
+                          "{} {}".format(name, value)]
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide metrics recorded by @instrumented
+latencyMetrics = LatencyMetrics()
+
+
+# The instrumented call running in this thread (or task), if any
+_currentCall = contextvars.ContextVar('currentCall', default=None)
+
+
+class _Call:
+
+    def __init__(self, function):
+        self.function = function
+        self.stages = {}
+
+
+@contextlib.contextmanager
+def stage(name):
+    call = _currentCall.get()
+    if call is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        call.stages[name] = call.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+# Decorator form of stage(): every call of the decorated function is (part of) the stage called name
+def staged(name):
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# The instrumented function that ran last in every session (bokeh Document), for the serialize/send stages
+_lastCall = weakref.WeakKeyDictionary()
+
+# The Document of the session an instrumented call runs for, when that is not pn.state.curdoc (see session_document)
+_sessionDocument = contextvars.ContextVar('sessionDocument', default=None)
+
+
+# Books the instrumented calls made inside the with block to the session of doc. For calls running outside the
+# session's own thread (e.g. on the threads of a Panel_Helpers.RenderQueue), where pn.state.curdoc is not set.
+@contextlib.contextmanager
+def session_document(doc):
+    token = _sessionDocument.set(doc)
+    try:
+        yield
+    finally:
+        _sessionDocument.reset(token)
+
+
+# numbers the profiles, so that slow calls in the same second don't overwrite each other's profile
+_profileNumbers = itertools.count(1)
+
+
+class _Profile:
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        if profiler == "pyinstrument":
+            import pyinstrument
+            self._profile = pyinstrument.Profiler()
+        else:
+            import cProfile
+            self._profile = cProfile.Profile()
+
+    def __enter__(self):
+        (self._profile.start if self.profiler == "pyinstrument" else self._profile.enable)()
+        return self
+
+    def __exit__(self, *exc):
+        (self._profile.stop if self.profiler == "pyinstrument" else self._profile.disable)()
+
+    def save(self, function):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, "{}-{}-{}".format(function, time.strftime("%Y%m%d-%H%M%S"),
+                                                          next(_profileNumbers)))
+        if self.profiler == "pyinstrument":
+            with open(path + ".html", "w", encoding="utf-8") as file:
+                file.write(self._profile.output_html())
+        else:
+            # open with python -m pstats, or snakeviz
+            self._profile.dump_stats(path + ".prof")
+
+
+# Records the duration of every call of func (and of the stages marked inside it) under name, func's name by default
+def instrumented(func=None, name=None, metrics=latencyMetrics):
+    if func is None:
+        return functools.partial(instrumented, name=name, metrics=metrics)
+    function = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call = _Call(function)
+        # only the outermost instrumented call runs under the profiler
+        profile = _Profile(PROFILER) if PROFILER and _currentCall.get() is None else contextlib.nullcontext()
+        token = _currentCall.set(call)
+        start = time.perf_counter()
+        try:
+            with profile:
+                return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            _currentCall.reset(token)
+
+            metrics.observe(function, 'total', seconds)
+            for stageName, stageSeconds in call.stages.items():
+                metrics.observe(function, stageName, stageSeconds)
+            if seconds > SLOW_CALL:
+                metrics.slow_call(function)
+                if isinstance(profile, _Profile):
+                    profile.save(function)
+
+            doc = _sessionDocument.get() or pn.state.curdoc
+            if doc is not None:
+                _lastCall[doc] = function
+
+    return wrapper
+
+
+def _booked_to(doc):
+    return _lastCall.get(doc, "(no callback)") if doc is not None else "(no callback)"
+
+
+# (Protocol.create, WSHandler.write_message) as they were before instrument_bokeh_server(), None when not instrumented
+_originals = None
+
+
+# The Document of the session a bokeh websocket handler belongs to, or None (e.g. before the session is set up, or after
+# it was detached -- the connection's session property asserts in that case, so _session is read instead)
+def _handler_document(handler):
+    connection = getattr(handler, 'connection', None)
+    session = connection._session if connection is not None else None
+    return session.document if session is not None else None
+
+
+# Times the PATCH-DOC messages bokeh/Panel send to the browsers ('serialize') and the websocket frames they are written
+# as ('send'). Patches the bokeh protocol and bokeh's websocket handler (no other websocket handler of the process), so
+# it is only done when serving with metrics; uninstrument_bokeh_server() undoes it.
+def instrument_bokeh_server(metrics=latencyMetrics):
+    global _originals
+    if _originals is not None:
+        return
+
+    from bokeh.protocol import Protocol
+    from bokeh.server.views.ws import WSHandler
+
+    create = Protocol.create
+    writeMessage = WSHandler.write_message
+
+    @functools.wraps(create)
+    def timed_create(self, msgtype, *args, **kwargs):
+        if msgtype != 'PATCH-DOC':
+            return create(self, msgtype, *args, **kwargs)
+        start = time.perf_counter()
+        message = create(self, msgtype, *args, **kwargs)
+        # the JSON of the events is built lazily, on first access
+        message.content_json
+        events = args[0] if args else []
+        doc = events[0].document if events else None
+        metrics.observe(_booked_to(doc), 'serialize', time.perf_counter() - start)
+        return message
+
+    @functools.wraps(writeMessage)
+    async def timed_write_message(self, message, binary=False, locked=True):
+        function = _booked_to(_handler_document(self))
+        start = time.perf_counter()
+        try:
+            await writeMessage(self, message, binary=binary, locked=locked)
+        finally:
+            metrics.observe(function, 'send', time.perf_counter() - start)
+
+    _originals = (create, writeMessage)
+    Protocol.create = timed_create
+    WSHandler.write_message = timed_write_message
+
+
+# Restores what instrument_bokeh_server() patched
+def uninstrument_bokeh_server():
+    global _originals
+    if _originals is None:
+        return
+
+    from bokeh.protocol import Protocol
+    from bokeh.server.views.ws import WSHandler
+
+    Protocol.create, WSHandler.write_message = _originals
+    _originals = None
+
+
+# Serves the metrics of this server process
+def metrics_handler(metrics=latencyMetrics):
+    from tornado.web import RequestHandler
+
+    class MetricsHandler(RequestHandler):
+
+        def get(self):
+            self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.write(metrics.prometheus())
+
+    return MetricsHandler
+
+
+# Serves the given app scripts like `panel serve` does, plus the /metrics endpoint
+def serve(scripts, port=5006, show=False, **kwargs):
+    instrument_bokeh_server()
+    apps = {os.path.splitext(os.path.basename(script))[0]: script for script in scripts}
+    return pn.serve(apps, port=port, show=show, extra_patterns=[(r"/metrics", metrics_handler())], **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves Panel apps with a /metrics endpoint")
+    parser.add_argument('scripts', nargs='+', help="app scripts to serve")
+    parser.add_argument('--port', type=int, default=5006)
+    parser.add_argument('--show', action='store_true', help="open the apps in a browser")
+    parser.add_argument('--profiler', choices=["cProfile", "pyinstrument"], default=None,
+                        help="profile every call and keep the profiles of calls slower than --slow-call")
+    parser.add_argument('--slow-call', type=float, default=SLOW_CALL, help="seconds (default: %(default)s)")
+    args = parser.parse_args()
+
+    # through the module rather than __main__, which the app scripts import their decorator from
+    import Latency_Metrics
+    Latency_Metrics.PROFILER = args.profiler
+    Latency_Metrics.SLOW_CALL = args.slow_call
+    Latency_Metrics.serve(args.scripts, port=args.port, show=args.show)
@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Helpers for drawing matplotlib figures in the Panel apps
+#
+# - plt.figure() registers every new figure with pyplot's global figure manager, which keeps it alive until
+#   plt.close() is called. A callback that calls plt.figure() on every widget change therefore leaks one figure
+#   per event in a long running server (and soon triggers the "More than 20 figures have been opened" warning).
+#
+# - Figures created directly from matplotlib.figure.Figure are not tracked by pyplot at all. FigurePool keeps one
+#   such figure per plot, so that a callback can update the markers of its existing scatter plot (draw_scatter)
+#   instead of building a new figure on every event.
+#
+# - draw_density() is the counterpart of draw_scatter() for datasets with millions of rows: it shows a density image
+#   of the points (see Raster_Helpers.py) instead of drawing every single marker.
+#
+# - plot_scatter() and plot_by_category() draw the complete scatter plots of the reactive apps on a given axes. The
+#   plot functions of the apps call them in the server process, and scatter_figure() and category_figure() call them
+#   in a RenderPool worker process (see Render_Pool.py): those only take names and widget values, and load the dataset
+#   themselves. Either way the very same code draws the plot.
+#
+# - GridRenderer renders grids of subplots (like the 2x2 grid of the tips report) from a spec of what every cell shows,
+#   cell(draw function, arguments...), instead of drawing, cla()-ing and redrawing subplots of a pyplot figure. Every
+#   cell is rendered on its own into a cached layer of pixels, and the grid image is blitted together from the
+#   background (figure color and title) and the layers. Rendering the next grid only draws the cells whose spec
+#   changed, and only recomposes the part of the image they cover -- for report jobs rendering thousands of grids
+#   that mostly differ in a cell or two. draw_cells() draws the same spec on the axes of a pyplot figure.
+
+import functools
+import hashlib
+import threading
+import types
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_hex
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+
+from Dataset_Loader import dataset_version, declare_column, derived_column, group_index, load_dataset
+from Latency_Metrics import stage, staged
+from Raster_Helpers import DENSITY_THRESHOLD, data_range, rasterize, shade
+
+
+class FigurePool:
+
+    def __init__(self):
+        self._figures = {}
+        self._lock = threading.Lock()
+
+    # Returns (figure, axes, created) for the given plot name; created is True only the first time
+    def get(self, name, figsize):
+        with self._lock:
+            entry = self._figures.get(name)
+            if entry is not None:
+                return entry + (False,)
+
+            fig = Figure(figsize=figsize)
+            ax = fig.add_subplot()
+            self._figures[name] = (fig, ax)
+            return fig, ax, True
+
+
+# Draws a scatter plot on ax. The first call creates the PathCollection holding the markers; later calls only move
+# the existing markers (offsets) and change their sizes/color, and then rescale the axes to the new points.
+@staged('draw')
+def draw_scatter(ax, x, y, s=None, color=None, **kwargs):
+    offsets = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)])
+
+    if ax.collections:
+        points = ax.collections[0]
+        points.set_offsets(offsets)
+        if s is not None:
+            points.set_sizes(np.atleast_1d(np.asarray(s, dtype=float)))
+        if color is not None:
+            points.set_color(color)
+    else:
+        points = ax.scatter(offsets[:, 0], offsets[:, 1], s=s, color=color, **kwargs)
+
+    # Forget the limits of the previous points, otherwise the axes could only ever grow
+    ax.ignore_existing_data_limits = True
+    ax.update_datalim(offsets[np.isfinite(offsets).all(axis=1)])
+    ax.autoscale_view()
+
+    return points
+
+
+# Draws a density image of the points on ax, reusing the image drawn by an earlier call when there is one. codes holds
+# the category of every point and colors the '#rrggbb' color of every category; labels adds a legend entry per color.
+@staged('draw')
+def draw_density(ax, x, y, codes, colors, labels=None, start=None):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xRange, yRange = data_range(x, start), data_range(y, start)
+
+    image = shade(rasterize(x, y, codes, len(colors), xRange, yRange), colors)
+    extent = xRange + yRange
+
+    if ax.images:
+        ax.images[0].set_data(image)
+        ax.images[0].set_extent(extent)
+    else:
+        ax.imshow(image, extent=extent, origin='lower', aspect='auto', interpolation='nearest')
+
+    if labels is not None:
+        ax.legend(handles=[Patch(color=color, label=label) for color, label in zip(colors, labels)])
+
+    ax.set_xlim(xRange)
+    ax.set_ylim(yRange)
+    return ax.images[0]
+
+
+# Declares (once) the derived column of marker sizes (frame[column] / divisor)**2 and returns its name, so the sizes
+# are only computed on first use, in every process drawing with them, and then shared (see Dataset_Loader.declare_column)
+def marker_size_column(column, divisor):
+    name = "{}_marker_size_{}".format(column, divisor)
+    declare_column(name, lambda frame: (frame[column].to_numpy(dtype=float) / divisor)**2)
+    return name
+
+
+# Scatter plot of frame[y] against frame[x] on ax, updating the scatter drawn by an earlier call (see draw_scatter). The
+# markers get size s, or (frame[column] / divisor)**2 with sizeBy=(column, divisor). where=(column, values) only draws
+# the rows whose column is one of values (see GroupIndex.select).
+def plot_scatter(ax, frame, x, y, color, s=None, sizeBy=None, where=None, alpha=0.25):
+    rows = slice(None) if where is None else group_index(frame, where[0]).select(where[1])
+    if sizeBy is not None:
+        s = derived_column(frame, marker_size_column(*sizeBy))[rows]
+
+    draw_scatter(ax, frame[x].to_numpy()[rows], frame[y].to_numpy()[rows], s=s, color=color, alpha=alpha)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+
+
+# Scatter plot of frame[y] against frame[x] on an empty ax, with one scatter and legend entry per value of column (in
+# sorted order, like groupby() would draw them) and markers sized like plot_scatter's sizeBy. Above DENSITY_THRESHOLD
+# rows it draws a density image with the same colors instead.
+def plot_by_category(ax, frame, x, y, column, sizeBy=None, alpha=0.5):
+    index = group_index(frame, column)
+
+    if len(frame) > DENSITY_THRESHOLD:
+        # matplotlib's default colors C0, C1, ... in drawing order, like the markers would get
+        colors = [None] * len(index.factors)
+        for position, k in enumerate(index.sortedOrder):
+            colors[k] = to_hex('C{}'.format(position))
+        draw_density(ax, frame[x], frame[y], index.codes, colors, labels=index.factors)
+
+    else:
+        # the columns split by category (each one only once per process)
+        with stage('data'):
+            xByCategory = index.split(frame[x], name=x)
+            yByCategory = index.split(frame[y], name=y)
+            sizes = [None] * len(index.factors)
+            if sizeBy is not None:
+                name = marker_size_column(*sizeBy)
+                sizes = index.split(derived_column(frame, name), name=name)
+
+        with stage('draw'):
+            for k in index.sortedOrder:
+                ax.scatter(xByCategory[k], yByCategory[k], s=sizes[k], edgecolor='gray', alpha=alpha,
+                           label=index.factors[k])
+        ax.legend()
+
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.set_ylim(bottom=0)
+
+
+# The figures drawn by scatter_figure(), one pool per (worker) process
+_scatterFigures = FigurePool()
+
+
+# plot_scatter() of the dataset at path, on the pooled figure called name
+def scatter_figure(name, path, x, y, color, s=None, figsize=(7, 5), **kwargs):
+    fig, ax, _ = _scatterFigures.get(name, figsize)
+    plot_scatter(ax, load_dataset(path), x, y, color, s=s, **kwargs)
+    return fig
+
+
+# plot_by_category() of the dataset at path, on a new figure
+def category_figure(path, x, y, column, figsize=(6, 5), **kwargs):
+    fig = Figure(figsize=figsize)
+    plot_by_category(fig.add_subplot(), load_dataset(path), x, y, column, **kwargs)
+    return fig
+
+
+# What one cell of a grid shows: draw(ax, *args, **kwargs) draws it on the cell's axes
+CellSpec = namedtuple('CellSpec', ['draw', 'args', 'kwargs'])
+
+
+def cell(draw, *args, **kwargs):
+    return CellSpec(draw, args, kwargs)
+
+
+# Plots a DataFrame/Series on ax with pandas (data.plot(ax=ax, **kwargs)); legend holds the arguments of ax.legend()
+def plot_frame(ax, data, legend=None, **kwargs):
+    data.plot(ax=ax, **kwargs)
+    if legend is not None:
+        ax.legend(**legend)
+
+
+# Draws the cells ({(row, column): cell(...)}) on a grid of axes, e.g. the one of plt.subplots()
+def draw_cells(axes, cells):
+    for (row, column), spec in cells.items():
+        spec.draw(axes[row, column], *spec.args, **spec.kwargs)
+
+
+# The data (DataFrames, Series, arrays) among the module globals the code of func reads, e.g. a frame the cell plots
+# without getting it as an argument: a frame handed out by Dataset_Loader by its version (a reload gives a new one),
+# any other data by its identity -- hashing the contents of a whole dataset for every cell would cost more than drawing it,
+# so data that changes has to be assigned anew rather than modified in place
+def _global_data(func):
+    names, codes = set(), [func.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        # (and the names read by the lambdas and comprehensions inside of func)
+        codes.extend(const for const in code.co_consts if hasattr(const, 'co_names'))
+
+    namespace = getattr(func, '__globals__', {})
+    data = []
+    for name in sorted(names):
+        value = namespace.get(name)
+        if isinstance(value, (pd.DataFrame, pd.Series, pd.Index, np.ndarray)):
+            version = dataset_version(value) if isinstance(value, pd.DataFrame) else None
+            data.append((name, ('version', version) if version is not None else _Identity(value)))
+    return tuple(data)
+
+
+# Compares equal to the _Identity of the very same object only. It keeps the object alive, so that another object can
+# not take over its id while a fingerprint still refers to it.
+class _Identity:
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and other.value is self.value
+
+    def __hash__(self):
+        return id(self.value)
+
+
+# The version of the state of obj, for the fingerprint of its bound methods: its version attribute (or what its
+# version() method returns, like for a DatasetStream), a DataFrame's dataset version, or None for objects whose
+# methods are assumed to always draw the same
+def _object_version(obj):
+    if isinstance(obj, pd.DataFrame):
+        return dataset_version(obj)
+    version = getattr(obj, 'version', None)
+    return version() if callable(version) else version
+
+
+# A value that compares equal for equal arguments of a cell: arrays and pandas objects by their contents, functions by
+# their code, the values they close over (so the same lambda made again is still the same function) and the data
+# they read from module globals, bound methods also by the object they are bound to and its version
+def _fingerprint(value):
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        if isinstance(value, pd.DataFrame):
+            # (the names of the index and the columns end up as axis labels and legend titles)
+            names = (tuple(value.columns), value.columns.name, tuple(value.index.names), tuple(map(str, value.dtypes)))
+        elif isinstance(value, pd.Series):
+            names = (value.name, tuple(value.index.names), str(value.dtype))
+        else:
+            names = (tuple(value.names), str(value.dtype))
+        hashes = pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy()
+        return (type(value), value.shape, names, hashlib.blake2b(hashes.tobytes(), digest_size=16).digest())
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return (np.ndarray, value.shape, tuple(_fingerprint(item) for item in value.flat))
+        return (np.ndarray, value.shape, value.dtype.str,
+                hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16).digest())
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_fingerprint(item) for item in value))
+    if isinstance(value, dict):
+        return (dict, tuple(sorted((key, _fingerprint(item)) for key, item in value.items())))
+    if isinstance(value, functools.partial):
+        return (functools.partial, _fingerprint(value.func), _fingerprint(value.args), _fingerprint(value.keywords))
+    if isinstance(value, types.MethodType):
+        owner = value.__self__
+        return (types.MethodType, _Identity(owner), _object_version(owner), _fingerprint(value.__func__))
+    if hasattr(value, '__code__'):
+        closure = tuple(_fingerprint(closureCell.cell_contents) for closureCell in value.__closure__ or ())
+        return (value.__code__, closure, _fingerprint(value.__defaults__ or ()), _global_data(value))
+    return value
+
+
+# Renders a grid of rows x columns subplots into an RGBA image, drawing only the cells whose spec changed since the
+# previous render(). Cells must draw on their own axes only (no twin axes, no figure legends); what they draw may
+# stick out of their axes (tick labels, titles, legends), and overlapping cells are stacked in row-major order.
+class GridRenderer:
+
+    def __init__(self, rows, columns, figsize, dpi=100, titleSize=15, **adjust):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.titleSize = titleSize
+        self._canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.subplots(rows, columns, squeeze=False)
+        self.figure.subplots_adjust(**adjust)
+        self.positions = [(row, column) for row in range(rows) for column in range(columns)]
+
+        # position -> fingerprint of the spec its layer was drawn from
+        self._keys = {}
+        # position -> (top, bottom, left, right, pixels) of the layer: the non-transparent part of the cell's image
+        self._layers = {}
+        self._title = None
+        self._background = None
+        self._image = None
+
+        # cells drawn so far, to tell how much the cache saves
+        self.cellsDrawn = 0
+
+    # Renders the grid of the given cells ({(row, column): cell(...)}, positions without one get empty axes) and
+    # returns it as a read-only (height, width, 4) uint8 RGBA array. The array is only valid until the next render().
+    def render(self, cells, title=None):
+        dirty = []
+        if self._background is None or title != self._title:
+            self._title = title
+            self._background = self._render_background(title)
+            self._image = self._background.copy()
+            dirty.append((0, self._image.shape[0], 0, self._image.shape[1]))
+
+        for position in self.positions:
+            spec = cells.get(position)
+            key = None if spec is None else (_fingerprint(spec.draw), _fingerprint(spec.args),
+                                             _fingerprint(spec.kwargs))
+            if position in self._layers and self._keys[position] == key:
+                continue
+
+            ax = self.axes[position]
+            ax.cla()
+            if spec is not None:
+                spec.draw(ax, *spec.args, **spec.kwargs)
+            self.cellsDrawn += 1
+
+            if position in self._layers:
+                dirty.append(self._layers[position][:4])
+            self._layers[position] = self._render_layer(ax)
+            self._keys[position] = key
+            dirty.append(self._layers[position][:4])
+
+        for region in dirty:
+            self._compose(region)
+
+        image = self._image.view()
+        image.flags.writeable = False
+        return image
+
+    # The grid as PNG file contents
+    def png(self, cells, title=None):
+        import io
+        from PIL import Image
+
+        data = io.BytesIO()
+        Image.fromarray(self.render(cells, title)).save(data, format='png')
+        return data.getvalue()
+
+    def _draw(self):
+        self._canvas.draw()
+        return np.array(self._canvas.buffer_rgba())
+
+    # The figure without any of the cells: its background color and title
+    def _render_background(self, title):
+        if title is None:
+            if self.figure._suptitle is not None:
+                self.figure._suptitle.set_visible(False)
+        else:
+            self.figure.suptitle(title, fontsize=self.titleSize).set_visible(True)
+        for ax in self.axes.flat:
+            ax.set_visible(False)
+        try:
+            return self._draw()
+        finally:
+            for ax in self.axes.flat:
+                ax.set_visible(True)
+
+    # The image of one cell on a transparent figure, cut down to the part of it that is not transparent
+    def _render_layer(self, only):
+        title = self.figure._suptitle
+        for ax in self.axes.flat:
+            ax.set_visible(ax is only)
+        if title is not None:
+            title.set_visible(False)
+        self.figure.patch.set_alpha(0)
+        try:
+            pixels = self._draw()
+        finally:
+            for ax in self.axes.flat:
+                ax.set_visible(True)
+            if title is not None:
+                title.set_visible(self._title is not None)
+            self.figure.patch.set_alpha(1)
+
+        rows = np.flatnonzero(pixels[:, :, 3].any(axis=1))
+        columns = np.flatnonzero(pixels[:, :, 3].any(axis=0))
+        if len(rows) == 0:
+            return (0, 0, 0, 0, pixels[:0, :0])
+        top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        return (top, bottom, left, right, pixels[top:bottom, left:right].copy())
+
+    # Puts the region (top, bottom, left, right) of the image together again: the background, and on top of it the
+    # layers of all the cells that cover part of the region
+    def _compose(self, region):
+        top, bottom, left, right = region
+        if top >= bottom or left >= right:
+            return
+        out = self._background[top:bottom, left:right].astype(np.uint16)
+
+        for position in self.positions:
+            layerTop, layerBottom, layerLeft, layerRight, pixels = self._layers.get(position, (0, 0, 0, 0, None))
+            rowStart, rowEnd = max(top, layerTop), min(bottom, layerBottom)
+            columnStart, columnEnd = max(left, layerLeft), min(right, layerRight)
+            if rowStart >= rowEnd or columnStart >= columnEnd:
+                continue
+            layer = pixels[rowStart - layerTop:rowEnd - layerTop, columnStart - layerLeft:columnEnd - layerLeft]
+            alpha = layer[:, :, 3:4].astype(np.uint16)
+            target = out[rowStart - top:rowEnd - top, columnStart - left:columnEnd - left]
+            # the layer over what is below it (the background is opaque, so the result is too)
+            target[:, :, :3] = (layer[:, :, :3] * alpha + target[:, :, :3] * (255 - alpha) + 127) // 255
+        self._image[top:bottom, left:right] = out
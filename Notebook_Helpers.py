@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Running the notebook exports outside of Jupyter
+#
+# - The scripts were exported from notebooks that start with the %matplotlib magic and bokeh's output_notebook(). Both
+#   only make sense in IPython, and get_ipython() does not even exist anywhere else (a Panel server, a worker process,
+#   a benchmark importing the script).
+#
+# - use_notebook_backend() applies the magic when running in IPython, with MPL_MAGIC ("notebook" unless the
+#   MPL_MAGIC environment variable says otherwise, e.g. "inline" or "widget"). Anywhere else it does nothing and
+#   matplotlib picks the backend itself: MPLBACKEND, the matplotlibrc, or Agg when there is no display.
+#
+# - output_notebook_inline() only imports bokeh.io and its INLINE resources (a few MB of JavaScript) in IPython.
+#
+# - in_notebook() tells whether a script runs in IPython, e.g. to display an app inline rather than start a server.
+
+import os
+import sys
+
+# The %matplotlib magic used in IPython
+MPL_MAGIC = os.environ.get("MPL_MAGIC", "notebook")
+
+
+# The running IPython shell, or None. IPython is only asked if it has been imported already, i.e. if we run in it.
+def ipython():
+    module = sys.modules.get("IPython")
+    return module.get_ipython() if module is not None else None
+
+
+def in_notebook():
+    return ipython() is not None
+
+
+def use_notebook_backend(magic=None):
+    shell = ipython()
+    if shell is not None:
+        shell.run_line_magic('matplotlib', magic or MPL_MAGIC)
+
+
+def output_notebook_inline():
+    if ipython() is not None:
+        import bokeh.io
+        from bokeh.resources import INLINE
+        bokeh.io.output_notebook(INLINE)
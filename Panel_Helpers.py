@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Helpers for the reactive (@pn.depends) functions of the Panel apps
+#
+# - The plot functions only depend on their widget values and on the dataset, so a user switching back to an earlier
+#   selection gets exactly the same plot again. RenderCache remembers those results in a bounded LRU cache.
+#
+# - The cache lives in this module, i.e. once per server process, so a plot rendered for one session is reused by
+#   every other session. That works for matplotlib because we store the rendered PNG bytes, which any session can
+#   display (memoize_png).
+#
+# - Bokeh models on the other hand belong to exactly one bokeh Document (one session) and can not be shared, so
+#   bokeh plots are only reused within the session that created them (memoize_bokeh). Every session gets a RenderCache
+#   of its own for them, which is dropped together with its models when the session is destroyed.
+#
+# - The size of every entry is counted, and the least recently used entries are dropped once the cache holds more
+#   than maxBytes. renderCache.stats() returns the hit/miss/eviction counters needed to size it, which are also served
+#   as the panel_render_cache_* metrics of Latency_Metrics.py.
+#
+# - LazyTabs is a pn.Tabs layout whose plot functions only run while their tab is the one being looked at: a tab is
+#   rendered the first time it is opened, and widget changes made while it is hidden are applied when it is shown again.
+#   Created with ready=False it shows loading spinners only, until start() is called (e.g. once the data is loaded).
+#
+# - Dragging a slider fires one event per intermediate value, and rendering every one of them makes the plot lag
+#   further and further behind the slider. coalesced() renders in the background (on the threads of a RenderQueue)
+#   and only ever renders the latest widget values: a render still waiting in the queue picks up the newest values
+#   when it starts, and the result of a render that was overtaken while running is thrown away instead of shown (and
+#   the plot rendered again). Every plot has at most one render queued or running at a time, so a plot's figure is
+#   never drawn by two threads at once, while the plots of different sessions render side by side.
+#   renderQueue.stats() returns the queue depth and the number of dropped and superseded renders.
+#
+# - memoize_png times the PNG encoding as the 'encode' stage of an @instrumented call (see Latency_Metrics.py).
+
+import functools
+import io
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import panel as pn
+from bokeh.models import ColumnDataSource
+
+from Latency_Metrics import latencyMetrics, session_document, stage
+
+
+class RenderCache:
+
+    def __init__(self, maxBytes=256 * 2**20):
+        self.maxBytes = maxBytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.currentBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Returns the cached value for key, or renders, stores and returns it. sizeof(value) gives its size in bytes.
+    def get_or_render(self, key, render, sizeof):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # Rendering happens outside the lock so that other sessions are not blocked meanwhile
+        value = render()
+        size = sizeof(value)
+
+        with self._lock:
+            if key not in self._entries and size <= self.maxBytes:
+                self._entries[key] = (value, size)
+                self.currentBytes += size
+                while self.currentBytes > self.maxBytes:
+                    _, (_, oldSize) = self._entries.popitem(last=False)
+                    self.currentBytes -= oldSize
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currentBytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.currentBytes, 'maxBytes': self.maxBytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# The process-wide cache used by the decorators below
+renderCache = RenderCache()
+
+
+# renderCache.stats() as Prometheus metrics
+def _render_cache_metrics():
+    stats = renderCache.stats()
+    return {'panel_render_cache_entries': stats['entries'], 'panel_render_cache_bytes': stats['bytes'],
+            'panel_render_cache_max_bytes': stats['maxBytes'], 'panel_render_cache_hits_total': stats['hits'],
+            'panel_render_cache_misses_total': stats['misses'],
+            'panel_render_cache_evictions_total': stats['evictions']}
+
+
+latencyMetrics.add_collector(_render_cache_metrics, help="The process-wide render cache of Panel_Helpers.py")
+
+
+# The key identifies the function by its file and name rather than the function object, because `panel serve`
+# re-executes the app script (and so re-creates the function) for every session. List values (e.g. of a
+# CheckButtonGroup) become tuples so that they can be part of the key.
+def _render_key(func, args, kwargs, version):
+    args = tuple(_hashable(value) for value in args)
+    kwargs = tuple(sorted((name, _hashable(value)) for name, value in kwargs.items()))
+    return (func.__code__.co_filename, func.__qualname__, args, kwargs, version())
+
+
+def _hashable(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+# Size of a bokeh model in bytes, estimated from the columns of its data sources plus a fixed amount for every model
+# in its graph (figure, axes, glyphs, tools, ...)
+MODEL_BYTES = 4096
+
+def _bokeh_nbytes(model):
+    size = 0
+    for source in model.select({'type': ColumnDataSource}):
+        for column in source.data.values():
+            size += column.nbytes if isinstance(column, np.ndarray) else 8 * len(column)
+    return size + MODEL_BYTES * len(model.references())
+
+
+# For functions returning a matplotlib figure (or the (png, width, height) of one): the figure is rendered to PNG once
+# and every session showing the same widget values afterwards gets a PNG pane with those bytes, without running the
+# function or matplotlib at all.
+# version is a function returning the current version of the dataset, so a reloaded dataset is never served stale.
+def memoize_png(version, dpi=144, cache=renderCache):
+
+    def decorator(func):
+
+        def render(args, kwargs):
+            fig = func(*args, **kwargs)
+            # already rendered elsewhere (e.g. by a RenderPool worker) as (png bytes, width, height)
+            if isinstance(fig, tuple):
+                return fig
+            with stage('encode'):
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format='png', dpi=dpi)
+            width, height = fig.get_size_inches()
+            return buffer.getvalue(), int(72 * width), int(72 * height)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            png, width, height = cache.get_or_render(_render_key(func, args, kwargs, version),
+                                                     lambda: render(args, kwargs), lambda value: len(value[0]))
+            return pn.pane.PNG(png, width=width, height=height)
+
+        return wrapper
+
+    return decorator
+
+
+# id of a session's Document -> (the Document, RenderCache of the bokeh models of that session). The Document is kept
+# so that its id can not be reused by another session while the entry exists.
+_sessionCaches = {}
+_sessionLock = threading.Lock()
+
+# Bytes of bokeh models kept per session
+SESSION_CACHE_BYTES = 32 * 2**20
+
+
+def _drop_session(docId):
+    with _sessionLock:
+        _sessionCaches.pop(docId, None)
+
+
+# The RenderCache of the session of doc, created the first time it is asked for
+def session_cache(doc):
+    with _sessionLock:
+        entry = _sessionCaches.get(id(doc))
+        if entry is None or entry[0] is not doc:
+            entry = _sessionCaches[id(doc)] = (doc, RenderCache(SESSION_CACHE_BYTES))
+            doc.on_session_destroyed(lambda context, docId=id(doc): _drop_session(docId))
+        return entry[1]
+
+
+# For functions returning a bokeh model: the model is reused when the same session asks for the same widget values
+# again. Outside of a session (e.g. a script or the static export) there is no Document to tie the models to, and the
+# function is simply called.
+def memoize_bokeh(version):
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            doc = pn.state.curdoc
+            if doc is None:
+                return func(*args, **kwargs)
+            key = _render_key(func, args, kwargs, version)
+            return session_cache(doc).get_or_render(key, lambda: func(*args, **kwargs), _bokeh_nbytes)
+
+        return wrapper
+
+    return decorator
+
+
+# Shows the result of a plot function in container (a pn.Column holding the previous result)
+def _show(container, result):
+    current = container[0] if len(container) else None
+    if result is current:
+        return
+    if isinstance(current, pn.pane.PaneBase) and type(result) is type(current):
+        # a new pane of the same kind (e.g. a cached PNG): keep the existing pane and only swap what it shows
+        current.object = result.object
+    elif isinstance(current, pn.pane.PaneBase) and not isinstance(result, pn.viewable.Viewable) \
+            and type(current).applies(result):
+        # same kind of plot as before (e.g. a new matplotlib figure): just swap the object shown by the pane
+        current.object = result
+    else:
+        container[:] = [result]
+
+
+class LazyTabs:
+
+    def __init__(self, ready=True, **params):
+        # dynamic=True already keeps bokeh from sending the contents of hidden tabs to the browser
+        self.tabs = pn.Tabs(dynamic=True, **params)
+        self.tabs.param.watch(self._tab_changed, 'active')
+        self.ready = ready
+
+        self._pending = []
+        self._panes = {}
+        self._stale = {}
+        # id of a placeholder -> [(widget, watcher)]
+        self._watchers = {}
+
+    # Returns a placeholder for func(*widget values) to use in the layout of the next appended tab. The function runs
+    # when the tab is shown, and again on widget changes only if they happen while the tab is shown. With a queue (a
+    # RenderQueue) it runs on the queue's threads like a coalesced() plot, instead of on the session's thread.
+    def deferred(self, func, *widgets, queue=None):
+        container = pn.Column(pn.indicators.LoadingSpinner(value=True, width=40, height=40))
+        coalescer = None if queue is None else _Coalescer(queue, container, func, widgets)
+        pane = (container, func, widgets, coalescer)
+        self._pending.append(pane)
+        self._watchers[id(container)] = [(widget, widget.param.watch(lambda event, pane=pane: self._widget_changed(pane),
+                                                                     'value'))
+                                         for widget in widgets]
+        return container
+
+    # Stops running the function of a deferred() placeholder again on widget changes, e.g. once the browser follows
+    # the widgets on its own (Bokeh_Helpers.js_retarget_scatter). It still runs when its tab is first shown.
+    def unwatch(self, container):
+        for widget, watcher in self._watchers.pop(id(container), []):
+            widget.param.unwatch(watcher)
+
+    # Adds a tab, given a title and a layout containing the panes returned by deferred()
+    def append(self, title, layout):
+        index = len(self.tabs)
+        self.tabs.append((title, layout))
+
+        self._panes[index] = self._pending
+        self._stale[index] = set(range(len(self._pending)))
+        self._pending = []
+
+        if self.tabs.active == index:
+            self._refresh(index)
+
+    def _render(self, container, func, widgets, coalescer):
+        if coalescer is not None:
+            coalescer.submit()
+        else:
+            _show(container, func(*[widget.value for widget in widgets]))
+
+    # Renders the visible tab of a LazyTabs created with ready=False
+    def start(self):
+        self.ready = True
+        if self.tabs.active in self._stale:
+            self._refresh(self.tabs.active)
+
+    def _refresh(self, index):
+        if not self.ready:
+            return
+        stale, self._stale[index] = self._stale[index], set()
+        for position in sorted(stale):
+            self._render(*self._panes[index][position])
+
+    def _widget_changed(self, pane):
+        for index, panes in self._panes.items():
+            if pane in panes:
+                self._stale[index].add(panes.index(pane))
+                if self.tabs.active == index:
+                    self._refresh(index)
+
+    def _tab_changed(self, event):
+        if self._stale.get(event.new):
+            self._refresh(event.new)
+
+
+# The threads rendering coalesced() plots, and counters of what happened to the widget events
+class RenderQueue:
+
+    # Each coalesced() plot only has one render at a time (see _Coalescer), so several workers never draw the same
+    # figure at once -- they render different plots, e.g. those of different sessions (`panel serve` runs the app script,
+    # and so creates the pooled figures of Mpl_Helpers.FigurePool, once per session).
+    def __init__(self, workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.events = 0
+        self.rendered = 0
+        self.dropped = 0
+        self.superseded = 0
+
+    def stats(self):
+        with self._lock:
+            return {'queueDepth': self.queued, 'running': self.running, 'events': self.events,
+                    'rendered': self.rendered, 'dropped': self.dropped, 'superseded': self.superseded}
+
+
+# The process-wide queue used by coalesced()
+renderQueue = RenderQueue()
+
+
+class _Coalescer:
+
+    def __init__(self, queue, container, func, widgets):
+        self.queue = queue
+        self.container = container
+        self.func = func
+        self.widgets = widgets
+        self.generation = 0
+        # None, 'queued' or 'running': the one render of this plot there can be at a time
+        self.state = None
+        # the session the plot belongs to, for the serialize/send timings of Latency_Metrics (render() runs on a thread
+        # of the queue, where pn.state.curdoc is not that session's Document)
+        self.document = pn.state.curdoc
+
+    def changed(self, event):
+        with self.queue._lock:
+            self.queue.events += 1
+        self.submit()
+
+    # Makes sure the current widget values get rendered
+    def submit(self):
+        queue = self.queue
+        with queue._lock:
+            self.document = pn.state.curdoc or self.document
+            self.generation += 1
+            if self.state is not None:
+                # merged into the render already queued (it picks up the newest values when it starts) or running
+                # (render() queues the plot again once it is done): the values before these ones are dropped
+                queue.dropped += 1
+                return
+            self.state = 'queued'
+            queue.queued += 1
+        queue._executor.submit(self.render)
+
+    def render(self):
+        queue = self.queue
+        with queue._lock:
+            queue.queued -= 1
+            queue.running += 1
+            self.state = 'running'
+            generation = self.generation
+            values = [widget.value for widget in self.widgets]
+            document = self.document
+
+        try:
+            with session_document(document):
+                result = self.func(*values)
+            failed = False
+        except Exception:
+            logging.getLogger(__name__).exception("rendering %s failed", self.func.__qualname__)
+            failed = True
+
+        with queue._lock:
+            queue.running -= 1
+            current = generation == self.generation
+            if current:
+                self.state = None
+                if not failed:
+                    queue.rendered += 1
+            else:
+                # the widgets changed meanwhile: render again, behind the plots already waiting for a worker
+                queue.superseded += 1
+                self.state = 'queued'
+                queue.queued += 1
+        if not current:
+            queue._executor.submit(self.render)
+        elif not failed:
+            # Panel sends changes made outside the session's thread to the browser on the session's next tick
+            _show(self.container, result)
+
+
+# Returns a pn.Column showing func(*widget values), kept up to date with the widgets in the background (see the top
+# of this file). The first result is rendered in the background as well, and a loading spinner is shown until then.
+def coalesced(func, *widgets, queue=None):
+    container = pn.Column(pn.indicators.LoadingSpinner(value=True, width=40, height=40))
+    coalescer = _Coalescer(queue or renderQueue, container, func, widgets)
+    for widget in widgets:
+        widget.param.watch(coalescer.changed, 'value')
+    coalescer.submit()
+    return container
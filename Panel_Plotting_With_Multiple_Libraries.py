@@ -15,8 +15,9 @@
 # In[1]:
 
 
-get_ipython().run_line_magic('matplotlib', 'inline')
-get_ipython().run_line_magic('matplotlib', 'notebook')
+# The %matplotlib notebook magic only applies in Jupyter (see Notebook_Helpers.py)
+from Notebook_Helpers import use_notebook_backend
+use_notebook_backend()
 
 
 # In[2]:
@@ -26,7 +27,6 @@ get_ipython().run_line_magic('matplotlib', 'notebook')
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn
 
 # Import any plotting library that you plan to use
 ...
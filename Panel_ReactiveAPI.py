@@ -29,8 +29,10 @@
 # - Makes the layout of the different components more explicit.
 
 
-get_ipython().run_line_magic('matplotlib', 'inline')
-get_ipython().run_line_magic('matplotlib', 'notebook')
+# The %matplotlib magic and bokeh's output_notebook() are applied by main(), and only in IPython (see Notebook_Helpers.py),
+# so the script can also be imported (panel serve, Latency_Metrics.py, Benchmarks.py). Importing it only declares the
+# widgets and plot functions; build_app() loads the data and lays out the apps.
+from Notebook_Helpers import use_notebook_backend, output_notebook_inline, in_notebook
 
 # first import our usual libraries
 import pandas as pd
@@ -43,30 +45,40 @@ import panel as pn
 from panel.interact import interact, interactive, fixed, interact_manual
 from panel import widgets
 
-# In the classic Jupyter notebook environment, first make sure to load the pn.extension(). 
-# Panel objects will then render themselves if they are the last item in a notebook cell.
-pn.extension()
+# Read the dataset -- load_dataset() parses the workbook only once and then hands the same DataFrame to every session
+from Dataset_Loader import load_dataset, dataset_version, group_index
 
+# (set by load_data(), which build_app() calls)
+auto = None
+autoOrigins = None
 
-# Read the dataset
-auto = pd.read_excel("AutoMPG.xlsx")
-
-auto
+def load_data():
+    global auto, autoOrigins
+    auto = load_dataset("AutoMPG.xlsx")
+    
+    # auto[auto.Origin.isin(uCountries)] would scan the whole Origin column and copy every column of the selected cars
+    # on each click. group_index() instead keeps one bitmask per Origin value (shared by all sessions), and select() ORs
+    # the bitmasks of the checked countries into the row positions of their cars -- only the plotted columns are then
+    # taken at those positions. (For a bokeh plot the positions can go into an IndexFilter of a CDSView instead.)
+    autoOrigins = group_index(auto, 'Origin')
+    return auto
 
 
-# The typical 3-line code for matplotlib scatterplot
+def scatter_example():
+    
+    # The typical 3-line code for matplotlib scatterplot
 
-# Create the figure container object
-myFig = plt.figure(figsize=(10,7))
+    # Create the figure container object
+    myFig = plt.figure(figsize=(10,7))
 
-# Now create a subplot
-myPlot = myFig.add_subplot(1,1,1)
+    # Now create a subplot
+    myPlot = myFig.add_subplot(1,1,1)
 
-# Using pandas plot method and ax attribute create a scatter plot of Wt X HP
-auto.plot.scatter('Weight', 'Horsepower', color='blue', s=10**2, alpha=0.1, ax=myPlot)
+    # Using pandas plot method and ax attribute create a scatter plot of Wt X HP
+    auto.plot.scatter('Weight', 'Horsepower', color='blue', s=10**2, alpha=0.1, ax=myPlot)
 
-# Let's explore what columns exists in our dataset
-auto.columns 
+    # Let's explore what columns exists in our dataset
+    print(auto.columns)
 
 
 # First explicity declare the widget elements for various parameters that our plotting function uses
@@ -86,35 +98,72 @@ uC = pn.widgets.ColorPicker(name='C', value='#654321')
 # IntSlider widget for size
 uS = pn.widgets.IntSlider(name='S', start=1, end=20, value=5)
 
+# Inside a callback, avoid plt.figure(): pyplot keeps every figure it creates alive until it is closed, so a new figure
+# on every widget change slowly eats up the server's memory. The figure pool hands each plot function its own figure
+# (created without pyplot) and plot_scatter() just moves the markers of the existing scatter plot around.
+from Mpl_Helpers import FigurePool, plot_scatter
+
+mplPool = FigurePool()
+
+# The rendered PNG of every combination of widget values is cached and shared with all sessions, so the function only
+# runs for combinations nobody has asked for yet (or after AutoMPG.xlsx changed).
+from Panel_Helpers import memoize_png
+
+# @instrumented records how long every call of the plot functions takes (and their 'draw', 'render' and 'encode'
+# stages), for the /metrics endpoint of `python Latency_Metrics.py Panel_ReactiveAPI.py`
+from Latency_Metrics import instrumented
+
+def auto_version():
+    return dataset_version(auto)
+
+# With offloadRendering the plots below are drawn by a pool of worker processes (Render_Pool.py), and the server only
+# waits for the finished PNG -- so one user's plot no longer holds up the plots of every other session. The workers
+# draw with Mpl_Helpers.scatter_figure(), i.e. the same plot_scatter() as the plot functions below, from their own copy
+# of the dataset. The waiting is done by the threads of the pool's queue (see build_app()), never by a session's own
+# thread. It is off unless the server is started with OFFLOAD_RENDERING=1: the worker processes take a while to start
+# and are only worth it for a server with several cores and many sessions.
+from Render_Pool import render_pool, offload_rendering
+from Mpl_Helpers import scatter_figure
+
+offloadRendering = offload_rendering()
+
+# (the worker processes are only started by build_app())
+renderPool = None
+
 # Function declaration with pn.depends decorator to link widgets to the function. 
 
 @pn.depends(uX, uY, uC, uS)
+@instrumented
+@memoize_png(auto_version)
 def react_mpl_plot(uXVar, uYVar, uColor, uSize):
     
-    # Create the figure container and subplot
-    rFig = plt.figure(figsize=(7, 5))
-    rPlot = rFig.add_subplot()
+    if offloadRendering:
+        return renderPool.render(scatter_figure, 'react_mpl_plot', "AutoMPG.xlsx", uXVar, uYVar, uColor, s=uSize**2)
+    
+    # Get the figure container and subplot for this plot from the pool (they are only created on the first call)
+    rFig, rPlot, _ = mplPool.get('react_mpl_plot', figsize=(7, 5))
     
     # Manipulate the marker size variable to allow for proper marker size
     uSize=uSize**2
     
-    # Call the .scatter() method with specs for x,y, color, size, and alpha i.e. transparency value for marker 
-    auto.plot.scatter(uXVar, uYVar, ax=rPlot, color=uColor, s=uSize, alpha=0.25)
+    # Draw (or update) the scatter with specs for x,y, color, size, and alpha i.e. transparency value for marker 
+    # (plot_scatter also sets the proper labels for x and y axes)
+    plot_scatter(rPlot, auto, uXVar, uYVar, uColor, s=uSize, alpha=0.25)
     
     # return the figure container so that it can be used by the API functions
     return rFig
-   
-from bokeh.resources import INLINE
-import bokeh.io
-bokeh.io.output_notebook(INLINE) 
 
 # finally lay out the widgets and the react_mpl_plot function explicitly.
 
 # Use servable method to run the app within the notebook (rendering is somewhat unpredictable)
 #pn.Row(pn.Column(uX,uY,uC,uS),react_mpl_plot).servable()
 
-# For more realiable rendering of the app use .show() method that launches the viz in a new browser window
-pn.Row(pn.Column(uX,uY,uC,uS),react_mpl_plot).show("This is the interactive panel viz for visualizing automobile features")
+# Dragging the size slider fires an event for every value it passes. coalesced() renders the plot in the background
+# and skips the values that are already out of date, so the plot keeps up with the slider (see Panel_Helpers.py).
+from Panel_Helpers import coalesced
+
+# The widgets of this app (uX, uY and uC are declared anew for the next ones)
+plotWidgets = (uX, uY, uC, uS)
 
 
 # ## Now let's create a plot that allows to use one of the variables to determine the size of the individual markers rather than letting the viewer control the size of markers
@@ -133,29 +182,36 @@ uC = pn.widgets.ColorPicker(name='C', value='#654321')
 # Notice in this case we are not declaring the size widget as we had in the previous case
 
 
+# Marker sizes based on the weight of the vehicle: (Weight/200)**2. With sizeBy=weightSizes, plot_scatter() declares
+# them as a derived column of the dataset, computed on first use and shared by all sessions.
+weightSizes = ('Weight', 200)
+
 # Function declaration with pn.depends decorator to link widgets to the function -- changes to the marker size option
 
 # Notice again that the decorator and function specs are missing the user defined parameter for size uS
 @pn.depends(uX, uY, uC)
+@instrumented
+@memoize_png(auto_version)
 def react_mpl_plot_weight(uXVar, uYVar, uColor):
     
-    # Create the figure container and subplot
-    rFig = plt.figure(figsize=(8.5,7))
-    rPlot = rFig.add_subplot()
+    if offloadRendering:
+        return renderPool.render(scatter_figure, 'react_mpl_plot_weight', "AutoMPG.xlsx", uXVar, uYVar, uColor,
+                                 sizeBy=weightSizes, figsize=(8.5,7))
     
-    # Manipulate the marker size variable based on the weight of the vehicle
-    uSize=((auto.Weight)/200)**2
+    # Get the figure container and subplot for this plot from the pool
+    rFig, rPlot, _ = mplPool.get('react_mpl_plot_weight', figsize=(8.5,7))
     
-    # Call the .scatter() method with specs for x,y, color, size, and alpha i.e. transparency value for marker 
-    auto.plot.scatter(uXVar, uYVar, ax=rPlot, color=uColor, s=uSize, alpha=0.25)
+    # Draw (or update) the scatter with specs for x,y, color, and alpha i.e. transparency value for marker, 
+    # with the marker size based on the weight of the vehicle (see weightSizes above the function)
+    plot_scatter(rPlot, auto, uXVar, uYVar, uColor, sizeBy=weightSizes, alpha=0.25)
     
     # return the figure container so that it can be used by the API functions
     return rFig
   
   
-# finally lay out the widgets and the react_mpl_plot_weight function explicitly.
+# finally lay out the widgets and the react_mpl_plot_weight function explicitly (in build_app() below).
 # pn.Row(pn.Column(uX,uY,uC), react_mpl_plot_weight).servable()
-pn.Row(pn.Column(uX,uY,uC), react_mpl_plot_weight).show("Using markers sized by car weight")
+weightWidgets = (uX, uY, uC)
 
 
 # # Practice exercise tasks
@@ -167,8 +223,8 @@ pn.Row(pn.Column(uX,uY,uC), react_mpl_plot_weight).show("Using markers sized by
 # ### Steps to get you started.... 
 
 
-# What are the values in the origin column?
-sorted(auto.Origin.unique()) 
+# What are the values in the origin column? (printed by main())
+# sorted(auto.Origin.unique())
 
 
 # ### how do we write the code for CheckButtonGroup widget?
@@ -182,18 +238,77 @@ sorted(auto.Origin.unique())
 uCntry = pn.widgets.CheckButtonGroup(name="Auto Country of Origin",
                                   value=[1], # Values already pre-selected
                                   options=[1,2,3]) # All the possible values
-uCntry
 
 
 
 ### Prepare the dataset to show only countries selected in the check box
-## Hint: Use .isin()
-
+## Hint: Use .isin() -- or autoOrigins.select(), see load_data() above
 
 
 # Now write the code for the function -- 
 # start with @pn.depends(nameOfYourWidgetVariable) followed by def functionName on the next line  
 
-@pn.depends ....
+@pn.depends(uX, uY, uC, uCntry)
+@instrumented
+@memoize_png(auto_version)
+def react_mpl_plot_country(uXVar, uYVar, uColor, uCountries):
+    
+    if offloadRendering:
+        return renderPool.render(scatter_figure, 'react_mpl_plot_country', "AutoMPG.xlsx", uXVar, uYVar, uColor,
+                                 sizeBy=weightSizes, where=('Origin', uCountries), figsize=(8.5,7))
+    
+    # Get the figure container and subplot for this plot from the pool
+    rFig, rPlot, _ = mplPool.get('react_mpl_plot_country', figsize=(8.5,7))
+    
+    # Draw (or update) the scatter of just the cars from the selected countries (where= selects their rows through
+    # autoOrigins.select()), sized by weight like in react_mpl_plot_weight
+    plot_scatter(rPlot, auto, uXVar, uYVar, uColor, sizeBy=weightSizes, where=('Origin', uCountries), alpha=0.25)
+    
+    return rFig
+
+countryWidgets = (uX, uY, uC, uCntry)
+
+
+# Now layout all the widgets and function calls using .show() or .servable() methods: build_app() loads the data,
+# starts the render pool and returns the three apps, main() shows each of them in its own browser window
+APP_TITLES = ("This is the interactive panel viz for visualizing automobile features",
+              "Using markers sized by car weight",
+              "Filtering cars by country of origin")
+
+def build_app():
+    global renderPool
+    load_data()
+    if offloadRendering and renderPool is None:
+        renderPool = render_pool(preload=["AutoMPG.xlsx"])
+    
+    # (Offloaded plots are waited for by the render pool's own threads, one per worker process.)
+    renderQueue = renderPool.queue if offloadRendering else None
+    
+    return [pn.Row(pn.Column(*widgets), coalesced(function, *widgets, queue=renderQueue))
+            for function, widgets in [(react_mpl_plot, plotWidgets), (react_mpl_plot_weight, weightWidgets),
+                                      (react_mpl_plot_country, countryWidgets)]]
+
+
+def main():
+    # In the classic Jupyter notebook environment, first make sure to load the pn.extension(). 
+    # Panel objects will then render themselves if they are the last item in a notebook cell.
+    if in_notebook():
+        use_notebook_backend()
+        output_notebook_inline()
+        pn.extension()
+    
+    apps = build_app()
+    scatter_example()
+    print(sorted(auto.Origin.unique()))
+    
+    # For more realiable rendering of the app use .show() method that launches the viz in a new browser window
+    for app, title in zip(apps, APP_TITLES):
+        app.show(title)
+
+
+if __name__ == "__main__":
+    main()
+elif __name__.startswith("bokeh_app"):
+    # panel serve Panel_ReactiveAPI.py: all three apps on one page
+    pn.Column(*build_app()).servable(title="Reactive API")
 
-# Now layout all the widgets and function calls using .show() or .servable() methods
@@ -2,39 +2,71 @@
 # coding: utf-8
 
 # # Adding bokeh plots to Panel based visualizations
-
-get_ipython().run_line_magic('matplotlib', 'inline')
-get_ipython().run_line_magic('matplotlib', 'notebook')
+#
+# Importing this script only defines the widgets and plot functions. build_app() loads the data and builds the app:
+# `panel serve Panel_and_Bokeh.py` serves it, and running the script (or the notebook) calls main(), which shows it.
 
 # importing libraries
 import matplotlib.pyplot as plt
 import pandas as pd
 
-# You will likely need to import any library that you plan to use, just to be safe
-import pandas_bokeh
-
-
-# Loading bokeh inline
-from bokeh.resources import INLINE
-import bokeh.io
-bokeh.io.output_notebook(INLINE) 
+# The %matplotlib magic, bokeh's output_notebook(INLINE) and pn.extension() are only needed in Jupyter, so main() does
+# them there (see Notebook_Helpers.py). pandas_bokeh is imported by the plot function that uses it.
+from Notebook_Helpers import use_notebook_backend, output_notebook_inline, in_notebook
 
 
 # Now import panel with an alias pn
 import panel as pn
 
-# In the classic Jupyter notebook environment, first make sure to load the pn.extension(). 
-# Panel objects will then render themselves if they are the last item in a notebook cell.
-pn.extension()
-
 
 # Read the dataset.. This is a slightly updated dataset with two new columns of Origin_Country and Weight_Size
 # Always use relative file path. Avoid using absolute filepath.
 # More on difference between absolute and relative file paths: https://www.educative.io/edpresso/absolute-vs-relative-path 
 
-auto = pd.read_excel("AutoMPG.xlsx")
-
-auto
+# load_dataset() parses the workbook only once per server process (and keeps a Parquet copy of it for the next process),
+# so every new session gets the same, already loaded DataFrame. Do not modify auto in place -- it is shared by all sessions.
+from Dataset_Loader import load_dataset, load_dataset_async, dataset_version, group_index, declare_column
+from Dataset_Loader import derived_frame, dataset_stream
+
+# Reading the workbook happens on a background thread (load_dataset_async, started by build_app), so that a new
+# session -- and every other session on the server meanwhile -- does not have to wait for it. In a served app the page
+# shows up right away with loading spinners in place of the plots, and use_dataset() below fills in the data once it
+# has been read.
+
+# New test records can be added while the app is running, from anywhere in the server process (e.g. a feeder thread):
+#     dataset_stream("AutoMPG.xlsx").append(newRecords)
+# The linked brushing plots of every open session then get the new cars (see bokeh_plot), and sessions opened later
+# start out with them. Weight_Size is computed for new records that don't have it. Only the last autoRollover cars
+# are kept.
+declare_column('Weight_Size', lambda frame: (frame['Weight']/300).round(2))
+autoRollover = 100000
+
+# Column we compute from Weight to size the markers. It is declared here and only computed the first time a plot
+# needs it; after that every session shares the same (read-only) values.
+declare_column('wt_size', lambda frame: frame['Weight']/300)
+
+# With more than DENSITY_THRESHOLD cars the browser can't keep up with one marker per car. The plots below then show
+# a density image per country instead (computed on the server), and the bokeh plots switch back to real markers once
+# the user zooms in to a small enough area. For our ~400 cars nothing changes.
+# Already above VIEWPORT_THRESHOLD cars the bokeh plots only get the cars inside their current view (plus a margin),
+# and fetch the others from the server when the user pans or zooms.
+from Raster_Helpers import VIEWPORT_THRESHOLD
+
+# Everything the plots need from the dataset, set by use_dataset()
+auto = None
+
+def use_dataset(frame):
+    global autoStream, auto, autoCountries, viewportDataset
+    
+    autoStream = dataset_stream("AutoMPG.xlsx", rollover=autoRollover)
+    auto = frame
+    
+    # The plots draw the cars country by country. Rather than running auto.groupby('Origin_Country') in every plot
+    # function, group_index() works out the list of countries and the rows of each country once, and shares it with
+    # all sessions.
+    autoCountries = group_index(auto, 'Origin_Country')
+    
+    viewportDataset = len(auto) > VIEWPORT_THRESHOLD
 
 
 # # Declare the widgets explicitly
@@ -89,37 +121,43 @@ from bokeh.models import ColumnDataSource
 from bokeh.transform import factor_cmap, factor_mark
 
 
-# A simple example of creating ColumnDataSource - from a dictionary
+# The examples below print their results, so they only run when the script is run (see main)
+from Bokeh_Helpers import make_cds
 
-myData = {'x_values': [1, 2, 3, 4, 5],
-          'y_values': [6, 7, 2, 3, 6]}
+def cds_examples():
+    
+    # A simple example of creating ColumnDataSource - from a dictionary
 
-myDF = pd.DataFrame(myData)
-myCDS = ColumnDataSource(data=myData)
+    myData = {'x_values': [1, 2, 3, 4, 5],
+              'y_values': [6, 7, 2, 3, 6]}
 
-print(myDF)
-print(myCDS.data)
+    myDF = pd.DataFrame(myData)
+    myCDS = ColumnDataSource(data=myData)
 
-#To add a new **column** to an existing ColumnDataSource:
+    print(myDF)
+    print(myCDS.data)
 
-new_sequence = [8, 1, 4, 7, 3]
-myCDS.data["z_val"] = new_sequence
-print(myCDS.data)
+    #To add a new **column** to an existing ColumnDataSource:
 
+    new_sequence = [8, 1, 4, 7, 3]
+    myCDS.data["z_val"] = new_sequence
+    print(myCDS.data)
 
-# # Creating a ColumnDataSource from a dataframe
-# If you use a pandas DataFrame, the resulting ColumnDataSource in Bokeh will have columns that correspond to the columns of the DataFrame. The naming of the columns follows these rules:
-# 
-# - If the DataFrame has a named index column, the ColumnDataSource will also have a column with this name.
-# 
-# - If the index name is None, the ColumnDataSource will have a generic name: either index (if that name is available) or level_0.
-# 
-# - See more on CDS here: https://docs.bokeh.org/en/latest/docs/user_guide/data.html#providing-data-as-a-columndatasource
 
-# Creating a CDS from auto dataframe
+    # # Creating a ColumnDataSource from a dataframe
+    # If you use a pandas DataFrame, the resulting ColumnDataSource in Bokeh will have columns that correspond to the columns of the DataFrame. The naming of the columns follows these rules:
+    # 
+    # - If the DataFrame has a named index column, the ColumnDataSource will also have a column with this name.
+    # 
+    # - If the index name is None, the ColumnDataSource will have a generic name: either index (if that name is available) or level_0.
+    # 
+    # - See more on CDS here: https://docs.bokeh.org/en/latest/docs/user_guide/data.html#providing-data-as-a-columndatasource
 
-autoCDS = ColumnDataSource(auto)
-autoCDS.data
+    # Creating a CDS from auto dataframe
+    # ColumnDataSource(auto) would copy every column of auto into every session, including columns that no glyph uses.
+    # make_cds() instead picks only the columns we ask for, and reuses the same read-only arrays for every session.
+    autoCDS = make_cds(auto, ['Horsepower', 'Acceleration', 'Weight_Size', 'Origin_Country'])
+    print(autoCDS.data)
 
 
 # ## A few more things to know about bokeh - II:
@@ -127,23 +165,51 @@ autoCDS.data
 # - [Detailed guide on styling with visual attributes](https://docs.bokeh.org/en/latest/docs/user_guide/styling.html)
 # - [Changing colors and marker types based on categorical columns](https://docs.bokeh.org/en/latest/docs/user_guide/data.html#mapping-marker-types)
 
-@pn.depends(uX, uY, uY2)
+# For a large dataset (see viewportDataset above) the two plots get a density layer
+from Bokeh_Helpers import ViewportSource, DensityLayer, StreamedSource, JS_AXES_TAG
+from bokeh.palettes import Category10
+
+# @instrumented records how long every call of the plot functions takes, split into the stages marked with
+# `with stage(...)`, for the /metrics endpoint of `python Latency_Metrics.py Panel_and_Bokeh.py`
+from Latency_Metrics import instrumented, stage
+
+# The Category10 colors for nCountries countries (at least 10 of them), starting over after the 10th country
+def country_palette(nCountries):
+    return [Category10[10][k % 10] for k in range(max(nCountries, 10))]
+
+# bokeh_plot builds both figures. It is called only once per session -- see show_bokeh_plot below for widget changes
+@instrumented
 def bokeh_plot(uXVar, uYVar, uYVar2):
     
     # specify which tools you want to enable. If not specified default setting will be used when charts are rendered
     TOOLS = "box_select,lasso_select,help, pan"
 
+    # Only the columns referenced by the glyphs below go into the data source shared by both plots. New cars are
+    # streamed into it (see below), so it gets every column the widgets can select right away -- a column added
+    # later on would not line up with the cars streamed in the meantime.
+    with stage('data'):
+        if viewportDataset:
+            autoCDS = make_cds(auto, [uXVar, uYVar, uYVar2, 'Weight_Size', 'Origin_Country'])
+        else:
+            autoCDS = make_cds(auto, uX.options + ['Weight_Size', 'Origin_Country'])
+
+    # Colors by country. Category10[10] starts with the same three colors as 'Category10_3', and leaves colors for
+    # countries that only show up in streamed records. The density images below use the same colors.
+    countryPalette = country_palette(len(autoCountries.factors))
+    countryColors = factor_cmap('Origin_Country', countryPalette, autoCountries.factors)
+
     # create a new figure container 
-    left = figure(tools=TOOLS, plot_width=450, plot_height=320, x_axis_label= uXVar, y_axis_label= uYVar, title="Scatter-1")
+    left = figure(tools=TOOLS, plot_width=450, plot_height=320, x_axis_label= uXVar, y_axis_label= uYVar, title="Scatter-1",
+                  name="Scatter-1")
     
     # Now add a circle renderer
-    left.circle(uXVar, uYVar, alpha=.6,  
+    leftPoints = left.circle(uXVar, uYVar, alpha=.6,  
                 
                 # Setting the size of markers based on weight of the vehicle
                 size='Weight_Size',             
                 
                 # coloring markers based on the country of origin
-                color=factor_cmap('Origin_Country', 'Category10_3', list(auto['Origin_Country'].unique())),
+                color=countryColors,
  
                 # Adding the legend based on the country of origin
                 legend_field="Origin_Country", 
@@ -153,7 +219,7 @@ def bokeh_plot(uXVar, uYVar, uYVar2):
                 nonselection_line_color="gray", nonselection_line_alpha=0.2,
                 
                 # Setting the data source to autoCDS. This will also automatically allow for linked brushing
-                source=autoCDS)
+                source=autoCDS, name="Scatter-1 points")
     
     # Starting the x- and y-range at 0 
     left.y_range.start = 0
@@ -180,16 +246,39 @@ def bokeh_plot(uXVar, uYVar, uYVar2):
     left.legend.margin = 2    
     
     # create the second scatter plot with a square renderer
-    right = figure(tools=TOOLS, plot_width=450, plot_height=320, x_axis_label= uXVar, y_axis_label= uYVar2, title="Scatter-2")
+    right = figure(tools=TOOLS, plot_width=450, plot_height=320, x_axis_label= uXVar, y_axis_label= uYVar2, title="Scatter-2",
+                   name="Scatter-2")
     
                    # Linking of x and y ranges to allow for linked panning.
                    # ADVISABLE TO use only when both plots have similar limits on the ranges
                    # x_range=left.x_range, y_range=left.y_range)
     
-    right.square(uXVar, uYVar2, size='Weight_Size', 
-                 #alpha=.3, legend_field="Origin_Country", color=factor_cmap('Origin_Country', 'Category10_3', list(auto['Origin_Country'].unique())),
+    rightPoints = right.square(uXVar, uYVar2, size='Weight_Size', 
+                 #alpha=.3, legend_field="Origin_Country", color=factor_cmap('Origin_Country', 'Category10_3', autoCountries.factors),
                  #nonselection_fill_alpha=0.2, nonselection_fill_color="gray",nonselection_line_color="gray", nonselection_line_alpha=0.2,
-                 source=autoCDS)
+                 source=autoCDS, name="Scatter-2 points")
+    
+    # For a large dataset both plots start out as density images (or markers, below DENSITY_THRESHOLD cars), and autoCDS
+    # only ever holds the cars that are shown as markers (the cars in view of a plot that is zoomed in far enough).
+    # Both plots still share it for linked brushing, and a selection survives panning and zooming.
+    if viewportDataset:
+        with stage('density'):
+            autoPoints = ViewportSource(autoCDS, auto)
+            densityLayers['Scatter-1'] = DensityLayer(left, leftPoints, autoPoints, autoCountries.codes, 
+                                                      countryPalette[:len(autoCountries.factors)], uXVar, uYVar, start=0)
+            densityLayers['Scatter-2'] = DensityLayer(right, rightPoints, autoPoints, autoCountries.codes, 
+                                                      ['#1f77b4'] * len(autoCountries.factors), uXVar, uYVar2)
+    
+    # Otherwise new cars appended to autoStream are sent to the browser as they come in: only the new rows travel,
+    # and autoCDS never holds more than autoRollover cars.
+    else:
+        if pn.state.curdoc is not None:
+            StreamedSource(autoCDS, autoStream, auto, pn.state.curdoc, mappers={'Origin_Country': [countryColors['transform']]})
+        
+        # autoCDS has every column the widgets offer, so the browser can switch the axes on its own (see below)
+        if jsAxes:
+            left.tags = [JS_AXES_TAG]
+            right.tags = [JS_AXES_TAG]
  
     # putting them in grid
     bkPlot = gridplot([[left, right]])
@@ -201,37 +290,100 @@ def bokeh_plot(uXVar, uYVar, uYVar2):
     return bokeh_pane
 
 
+# The figures are built the first time they are shown, with the widget values at that time
+bokeh_pane = None
+
+# The density layers of the two figures, if the dataset is large (see bokeh_plot)
+densityLayers = {}
+
+# Rebuilding both figures on every widget change makes the browser throw away and re-create the whole plot.
+# Instead, once the figures exist this function only points the existing glyphs at the newly selected columns and
+# updates the axis labels -- bokeh then sends just those few changes to the browser.
+from Bokeh_Helpers import retarget_scatter
+
+@instrumented
+def show_bokeh_plot(uXVar, uYVar, uYVar2):
+    global bokeh_pane
+    
+    if bokeh_pane is None:
+        bokeh_pane = bokeh_plot(uXVar, uYVar, uYVar2)
+        return bokeh_pane
+    
+    # finding the figures by the names we gave them in bokeh_plot
+    left = bokeh_pane.object.select_one({'name': 'Scatter-1'})
+    right = bokeh_pane.object.select_one({'name': 'Scatter-2'})
+    
+    # the browser switches the axes itself (see jsAxes below), without telling the server, so they are left alone here
+    if JS_AXES_TAG in left.tags:
+        return bokeh_pane
+    
+    # for a large dataset, first redraw the density images (this also puts the newly selected columns into autoCDS)
+    if densityLayers:
+        with stage('density'):
+            densityLayers['Scatter-1'].set_columns(uXVar, uYVar)
+            densityLayers['Scatter-2'].set_columns(uXVar, uYVar2)
+    
+    # the first plot also restarts its x- and y-range at 0, just like bokeh_plot does
+    with stage('retarget'):
+        retarget_scatter(left, left.select_one({'name': 'Scatter-1 points'}), auto, uXVar, uYVar, start=0)
+        retarget_scatter(right, right.select_one({'name': 'Scatter-2 points'}), auto, uXVar, uYVar2)
+    
+    return bokeh_pane
+
+
 # # Create the scatter plot using matplotlib
 
+# The plot functions below always produce the same plot for the same widget values, so their results are cached:
+# - memoize_png keeps the rendered PNG of a matplotlib figure and shares it with every session
+# - memoize_bokeh keeps a bokeh plot around for the session that created it (bokeh models can't be shared)
+# The dataset version is part of the cache key, so a new version of AutoMPG.xlsx is never shown with stale plots.
+# (bokeh_plot is not cached: it is only built once per session and afterwards just updated.)
+from Panel_Helpers import memoize_png, memoize_bokeh
+
+def auto_version():
+    return dataset_version(auto)
+
+# Density images for a large dataset
+from Mpl_Helpers import plot_by_category, category_figure
+from Bokeh_Helpers import density_scatter
+from bokeh.palettes import viridis
+
+
+# The markers are sized by weight: (Weight/300)**2, declared as a derived column of the dataset by plot_by_category()
+mplSizes = ('Weight', 300)
+
+# With offloadRendering the plot below is drawn by a pool of worker processes (Render_Pool.py, started by build_app()),
+# and the server only waits for the finished PNG -- on a thread of the pool's queue, so that no session waits for it
+# (see build_app()). The workers draw the same plot_by_category() from their own copy of AutoMPG.xlsx, so cars appended
+# to autoStream are only drawn in the server process. Off unless the server is started with OFFLOAD_RENDERING=1, like
+# in Panel_ReactiveAPI.py.
+from Render_Pool import render_pool, offload_rendering
+
+offloadRendering = offload_rendering()
+renderPool = None
 
 # Function declaration with pn.depends decorator to link widgets to the function. 
 @pn.depends(uX, uY)
+@instrumented
+@memoize_png(auto_version)
 def react_mpl_plot_weight(uXVar, uYVar):
     
+    if offloadRendering and autoStream.appended == 0:
+        return renderPool.render(category_figure, "AutoMPG.xlsx", uXVar, uYVar, 'Origin_Country', sizeBy=mplSizes,
+                                 figsize=(6,5))
+    
     # Create the figure container and subplot
     rFig = plt.Figure(figsize=(6,5))
     rPlot = rFig.add_subplot()
     
     # Removing the padding space from around the subplot
     rFig.subplots_adjust(left=None, bottom=None, right=None, top=None, wspace=None, hspace=None)
-      
-    # For loop to render the markers separately for each country
-    for country, df in auto.groupby('Origin_Country'):            
-        
-        # Note here we are using matplotlib's scatter method rather than using the pandas's plot method
-        rPlot.scatter(df[uXVar], df[uYVar],                                 # X and Y axis variables per user selection
-                      s=(df['Weight']/300)**2, edgecolor='gray', alpha=0.5, #sizing the markers based on Weight column
-                      label=country)                                        # adding the label
-    
-    # adding the legend box    
-    rPlot.legend()
     
-    # Setting the proper labels for x and y axes
-    rPlot.set_xlabel(uXVar)
-    rPlot.set_ylabel(uYVar)
-    
-    #setting y axis starting points to 0
-    rPlot.set_ylim(bottom=0)
+    # One scatter per country, in the same order as auto.groupby('Origin_Country') would give them, with a legend box,
+    # the proper labels for x and y axes and the y axis starting at 0. Note that plot_by_category uses matplotlib's
+    # scatter method rather than the pandas's plot method -- and for a large dataset a density image with the same
+    # colors the markers would get.
+    plot_by_category(rPlot, auto, uXVar, uYVar, 'Origin_Country', sizeBy=mplSizes)
     
     # return the figure container so that it can be used by the API functions
     return rFig
@@ -241,19 +393,45 @@ def react_mpl_plot_weight(uXVar, uYVar):
 
 # Function declaration with pn.depends decorator to link widgets to the function. 
 @pn.depends(uX, uY)
+@instrumented
+@memoize_bokeh(auto_version)
 def react_pandasBokeh_plot_weight(uXVar, uYVar):
     
+    # pandas_bokeh adds the .plot_bokeh method to DataFrames when it is imported. It takes a while to import, so that
+    # happens the first time the plot is drawn rather than when the script is loaded.
+    import pandas_bokeh
+    
     # Since bokeh uses only the columns inside the dataframe, 
-    # we need to create a column to use for sizing the markers based on weight
-    auto['wt_size']=auto.Weight/300 
+    # we need a column to use for sizing the markers based on weight. Instead of adding it to auto (which is shared
+    # with every other session), derived_frame() gives us a shared frame of just the plotted columns of auto plus the
+    # wt_size column.
+    with stage('data'):
+        autoPlot = derived_frame(auto, ['wt_size'], columns=[uXVar, uYVar, 'Origin_Country'])
     
-    # instead of specifying backend attribute, you can also directly call plot_bokeh method as below
-    bkPlot = auto.plot_bokeh.scatter(uXVar, uYVar, 
-                                     figsize=(450,320),
-                                     category='Origin_Country', colormap='Viridis', 
-                                     line_color='gray', line_width=1,
-                                     fontsize_legend=8, legend="top_left",                                      
-                                     size='wt_size', alpha=.5)
+    if viewportDataset:
+        
+        # pandas_bokeh would send every single car to the browser, so for a large dataset we build the same plot with
+        # plain bokeh: a density image that turns into markers once the user zooms in far enough
+        colors = viridis(len(autoCountries.factors))
+        bkPlot = figure(plot_width=450, plot_height=320, x_axis_label=uXVar, y_axis_label=uYVar)
+        density_scatter(bkPlot, autoPlot, autoCountries.codes, colors, uXVar, uYVar, 
+                        columns=['wt_size', 'Origin_Country'], 
+                        color=factor_cmap('Origin_Country', colors, autoCountries.factors), legend_field='Origin_Country',
+                        line_color='gray', line_width=1, size='wt_size', alpha=.5)
+        bkPlot.legend.location = "top_left"
+        bkPlot.legend.label_text_font_size = "8pt"
+    
+    else:
+        
+        # instead of specifying backend attribute, you can also directly call plot_bokeh method as below
+        # (show_figure=False: Panel shows the returned figure, otherwise pandas_bokeh also writes it to an HTML file
+        # in the working directory and opens that in a browser on every call)
+        bkPlot = autoPlot.plot_bokeh.scatter(uXVar, uYVar, 
+                                         figsize=(450,320),
+                                         category='Origin_Country', colormap='Viridis', 
+                                         line_color='gray', line_width=1,
+                                         fontsize_legend=8, legend="top_left",                                      
+                                         size='wt_size', alpha=.5, show_figure=False)
     
     # For detailed list of visual styling elements that you can customize in the underlying bokeh library, 
     # see https://docs.bokeh.org/en/latest/docs/user_guide/styling.html
@@ -269,21 +447,95 @@ def react_pandasBokeh_plot_weight(uXVar, uYVar):
 # ### Putting together these plots together with pn.Tabs, pn.Row, and pn.Column
 
 
-# Let's add a title and organize the widgets 
-title = pn.Row("** Auto MPG Explorer **",  margin=20, background='#f0f0f0')
-xyWid = pn.Row(uX, uY, uY2, margin=20, background='#f0f0f0')
+# With jsAxes the widgets switch the axes of the linked brushing plots right in the browser (a JavaScript callback
+# points the glyphs at the selected columns of autoCDS), so no Python runs and nothing goes over the websocket for
+# that tab. The matplotlib and pandas_bokeh plots can't do that and are still re-rendered in Python, and so is the
+# linked brushing demo for a large dataset (its data source only holds the cars in view, see bokeh_plot).
+from Bokeh_Helpers import js_retarget_scatter
 
+jsAxes = True
 
-tab1 = pn.Row(react_mpl_plot_weight, pn.Column(pn.Spacer(height=30),react_pandasBokeh_plot_weight))
-tab2 = pn.Column(bokeh_plot)
-tabs = pn.Tabs(("MPL/pandasBokeh", tab1), ("Bokeh linked brushing demo", tab2))
-#pn.Column(pn.Row(title, xyWid, height=100), tabs)
+if jsAxes:
+    js_retarget_scatter(uX, 'x', [("Scatter-1 points", "Scatter-1", 0), ("Scatter-2 points", "Scatter-2", None)])
+    js_retarget_scatter(uY, 'y', [("Scatter-1 points", "Scatter-1", 0)])
+    js_retarget_scatter(uY2, 'y', [("Scatter-2 points", "Scatter-2", None)])
 
-# Using .show() to start a Bokeh server instance from within your jupyter notebook for rapid prototyping
-# pn.Column(pn.Row(title, xyWid, height=100), tabs).show(title="Auto Analysis with .show")
 
-# Using .servable() to turn a notebook into a deployable app
-pn.Column(pn.Row(title, xyWid, height=100), tabs).servable(title="Auto Bokeh: Tabs/linked brushing")
+# LazyTabs only runs the plot functions of the tab that is being looked at. The plots of the second tab are not built
+# until a user opens it, and widget changes only re-render the plots of the visible tab (hidden tabs catch up when
+# they are opened again). lazyTabs.deferred(function, widgets...) takes the place of the function in the layout.
+from Panel_Helpers import LazyTabs
+import asyncio
+
+# Starts loading the data and returns the app
+def build_app():
+    global autoLoading, renderPool
+    
+    autoLoading = load_dataset_async("AutoMPG.xlsx")
+    if offloadRendering and renderPool is None:
+        renderPool = render_pool(preload=["AutoMPG.xlsx"])
+    
+    # Outside of a served app (e.g. in the notebook) there is nothing else to do meanwhile, so we simply wait for the data
+    if pn.state.curdoc is None or pn.state.curdoc.session_context is None:
+        use_dataset(autoLoading.result())
+    
+    # Let's add a title and organize the widgets 
+    title = pn.Row("** Auto MPG Explorer **",  margin=20, background='#f0f0f0')
+    xyWid = pn.Row(uX, uY, uY2, margin=20, background='#f0f0f0')
+    
+    # Until the data is there (see use_dataset above) the tabs only show loading spinners.
+    lazyTabs = LazyTabs(ready=auto is not None)
+    
+    # (an offloaded plot is waited for by the render pool's own threads)
+    tab1 = pn.Row(lazyTabs.deferred(react_mpl_plot_weight, uX, uY, queue=renderPool.queue if offloadRendering else None), 
+                  pn.Column(pn.Spacer(height=30), lazyTabs.deferred(react_pandasBokeh_plot_weight, uX, uY)))
+    lazyTabs.append("MPL/pandasBokeh", tab1)
+    
+    linkedPlots = lazyTabs.deferred(show_bokeh_plot, uX, uY, uY2)
+    tab2 = pn.Column(linkedPlots)
+    lazyTabs.append("Bokeh linked brushing demo", tab2)
+    
+    # Unless the dataset is large, the browser switches the axes of the linked brushing plots on its own (see jsAxes
+    # above), so the plots are only built in Python once -- no Python callback follows the widgets as well
+    def use_js_axes():
+        if jsAxes and not viewportDataset:
+            lazyTabs.unwatch(linkedPlots)
+    
+    if auto is not None:
+        use_js_axes()
+    
+    tabs = lazyTabs.tabs
+    
+    # Once the page is shown in the browser, wait for the data without blocking the server, then draw the plots
+    async def show_plots():
+        use_dataset(await asyncio.wrap_future(autoLoading))
+        use_js_axes()
+        lazyTabs.start()
+    
+    if auto is None:
+        pn.state.onload(show_plots)
+    
+    return pn.Column(pn.Row(title, xyWid, height=100), tabs)
+
+
+# In the notebook (or when run as a script) the app is shown right away, with the examples above
+def main():
+    
+    # In the classic Jupyter notebook environment, first make sure to load the pn.extension(). 
+    # Panel objects will then render themselves if they are the last item in a notebook cell.
+    if in_notebook():
+        use_notebook_backend()
+        output_notebook_inline()
+        pn.extension()
+    
+    app = build_app()
+    cds_examples()
+    
+    # Using .servable() in the notebook, or .show() to start a Bokeh server instance and open the app in a browser
+    if in_notebook():
+        return app.servable(title="Auto Bokeh: Tabs/linked brushing")
+    app.show(title="Auto Bokeh: Tabs/linked brushing")
+
 
 
 # ### Pushing changes after the initial setup
@@ -308,3 +560,11 @@ pn.Column(pn.Row(title, xyWid, height=100), tabs).servable(title="Auto Bokeh: Ta
 #     
 # - Can you make visual styling changes to the 2nd scatterplot so that it is consistent with the first bokeh scatterplot?
 # - After making these changes push them back to your heroku server?
+
+
+# `panel serve Panel_and_Bokeh.py` runs this script once per session, as a "bokeh_app_..." module. Using .servable()
+# to turn the notebook into a deployable app
+if __name__ == "__main__":
+    main()
+elif __name__.startswith("bokeh_app"):
+    build_app().servable(title="Auto Bokeh: Tabs/linked brushing")
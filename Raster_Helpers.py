@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Server-side rasterization of scatter plots with too many points for the browser
+#
+# - A scatter plot of a few hundred cars is fine, but with millions of rows every single point would have to be sent
+#   to (and drawn by) the browser. Above DENSITY_THRESHOLD points we instead count how many points of each category
+#   fall into every pixel of a small grid, and send that grid as one image.
+#
+# - rasterize() does the counting for all categories at once with a single np.bincount() over a combined
+#   (category, row, column) bin number, so there is no Python loop over points or categories.
+#
+# - shade() turns the counts into an RGBA image: every pixel gets the count-weighted mix of its categories' colors,
+#   and an opacity that grows with the (log of the) number of points in it.
+#
+# - GridIndex is a spatial index over the points of a scatter plot: the points are sorted by the cell of a regular grid
+#   they fall into, so the points inside a viewport can be found without looking at every single point.
+
+import numpy as np
+
+# Scatter plots with more points than this are drawn as a density image instead of individual markers
+DENSITY_THRESHOLD = 50000
+
+# Bokeh plots of datasets with more rows than this only send the points inside the current view to the browser
+VIEWPORT_THRESHOLD = 10000
+
+# Size of the density image in pixels
+RASTER_WIDTH = 450
+RASTER_HEIGHT = 320
+
+
+# Returns (low, high) of the finite values in values, widened a little if all values are the same
+def data_range(values, start=None):
+    finite = values[np.isfinite(values)]
+    low, high = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+    if start is not None:
+        low = min(low, start)
+    if high <= low:
+        low, high = low - 0.5, high + 0.5
+    return float(low), float(high)
+
+
+# Boolean mask of the points inside the rectangle xRange x yRange
+def in_viewport(x, y, xRange, yRange):
+    return (x >= xRange[0]) & (x <= xRange[1]) & (y >= yRange[0]) & (y <= yRange[1])
+
+
+# Counts the points of every category per pixel. codes holds the category (0..nCategories-1, or -1 to leave a point
+# out) of every point. Returns an array of shape (nCategories, height, width); row 0 is the bottom of the image.
+def rasterize(x, y, codes, nCategories, xRange, yRange, width=RASTER_WIDTH, height=RASTER_HEIGHT):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    codes = np.asarray(codes)
+    if len(codes) and codes.max() >= nCategories:
+        raise ValueError("codes go up to {} but there are only {} categories (and colors)".format(codes.max(),
+                                                                                                  nCategories))
+
+    inside = in_viewport(x, y, xRange, yRange) & (codes >= 0)
+
+    column = ((x[inside] - xRange[0]) * (width / (xRange[1] - xRange[0]))).astype(np.int64)
+    row = ((y[inside] - yRange[0]) * (height / (yRange[1] - yRange[0]))).astype(np.int64)
+
+    # points exactly on the right/top edge belong to the last pixel
+    np.minimum(column, width - 1, out=column)
+    np.minimum(row, height - 1, out=row)
+
+    bins = (codes[inside].astype(np.int64) * height + row) * width + column
+    counts = np.bincount(bins, minlength=nCategories * height * width)
+    return counts.reshape(nCategories, height, width)
+
+
+# Turns per-category counts into an RGBA image of shape (height, width, 4), colors being '#rrggbb' strings
+def shade(counts, colors, minAlpha=60):
+    rgb = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in colors], dtype=float)
+
+    total = counts.sum(axis=0)
+    filled = total > 0
+
+    image = np.zeros(total.shape + (4,), dtype=np.uint8)
+    mix = np.tensordot(counts, rgb[:len(counts)], axes=(0, 0))
+    image[filled, :3] = (mix[filled] / total[filled, None]).round()
+
+    if filled.any():
+        density = np.log1p(total[filled]) / np.log1p(total.max())
+        image[filled, 3] = (minAlpha + (255 - minAlpha) * density).round()
+    return image
+
+
+class GridIndex:
+
+    def __init__(self, x, y, cells=256):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.x, self.y = x, y
+        self.cells = cells
+        self.xRange, self.yRange = data_range(x), data_range(y)
+
+        rows = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        cellIds = self._cell(x[rows], self.xRange) + cells * self._cell(y[rows], self.yRange)
+
+        # rows sorted by cell; the rows of cell c are rows[starts[c]:starts[c + 1]]. Cells are numbered row by row, so
+        # the cells of one grid row between two columns are next to each other as well.
+        order = np.argsort(cellIds, kind='stable')
+        self.rows = rows[order]
+        self.starts = np.searchsorted(cellIds[order], np.arange(cells * cells + 1))
+
+    # Grid column (or row) of every value, clipped to the grid
+    def _cell(self, values, valueRange):
+        cell = np.floor((values - valueRange[0]) * (self.cells / (valueRange[1] - valueRange[0])))
+        return np.clip(cell, 0, self.cells - 1).astype(np.int64)
+
+    # Returns the (sorted) rows inside the rectangle xRange x yRange. With a limit, returns None instead as soon as it
+    # is clear that there are more than limit candidates, without collecting them.
+    def query(self, xRange, yRange, limit=None):
+        if xRange[1] < self.xRange[0] or xRange[0] > self.xRange[1] or \
+                yRange[1] < self.yRange[0] or yRange[0] > self.yRange[1]:
+            return np.zeros(0, dtype=np.int64)
+
+        column0, column1 = self._cell(np.array(xRange, dtype=float), self.xRange)
+        row0, row1 = self._cell(np.array(yRange, dtype=float), self.yRange)
+
+        firstCells = np.arange(row0, row1 + 1) * self.cells + column0
+        begins = self.starts[firstCells]
+        ends = self.starts[firstCells + (column1 - column0) + 1]
+        if limit is not None and (ends - begins).sum() > limit:
+            return None
+
+        candidates = np.concatenate([self.rows[begin:end] for begin, end in zip(begins, ends)])
+        inside = in_viewport(self.x[candidates], self.y[candidates], xRange, yRange)
+        return np.sort(candidates[inside])
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Rendering matplotlib figures in worker processes
+#
+# - Drawing a figure and encoding it as PNG is CPU bound and holds the GIL nearly all of the time, so a render running
+#   inside the server process stalls every other session served by that process.
+#
+# - RenderPool hands renders to a pool of worker processes (Agg backend) and only gets the encoded PNG/SVG bytes back,
+#   so the renders of different sessions run on different cores. render() waits for the bytes and is meant for a
+#   background thread (e.g. coalesced() with the pool's queue, see Panel_Helpers.py); async callbacks can await
+#   render_async() instead.
+#
+# - Only the plot function's name and its arguments are sent to a worker, so plot functions must be module level
+#   functions of an importable module (not of an app script, e.g. Mpl_Helpers.scatter_figure), and load their data
+#   themselves by path with load_dataset(). Each worker keeps its datasets in memory after the first render.
+#
+# - The apps only offload their plots when the server is started with OFFLOAD_RENDERING=1 in its environment (see
+#   offload_rendering()): the pool takes a while to start and is only worth it with several cores and many sessions.
+#
+# - Workers are warmed up when the pool starts: matplotlib is imported, the datasets in preload are loaded and a first
+#   figure is drawn, so the first real render does not pay for all of that.
+
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from Latency_Metrics import stage
+from Panel_Helpers import RenderQueue
+
+
+def _warm_up(preload):
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from Dataset_Loader import load_dataset
+
+    for path in preload:
+        load_dataset(path)
+
+    fig = Figure()
+    fig.add_subplot().plot([0, 1], [0, 1])
+    fig.savefig(io.BytesIO(), format='png')
+
+
+def _started():
+    return os.getpid()
+
+
+# Runs in a worker: returns (bytes, width, height) like the PNGs cached by memoize_png
+def _render(func, args, kwargs, format, dpi):
+    fig = func(*args, **kwargs)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format, dpi=dpi)
+    width, height = fig.get_size_inches()
+    return buffer.getvalue(), int(72 * width), int(72 * height)
+
+
+class RenderPool:
+
+    def __init__(self, processes=None, preload=()):
+        if processes is None:
+            processes = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        self.processes = processes
+
+        # spawn starts the workers from a fresh interpreter, so they don't inherit the threads and sockets of the server
+        self._executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_warm_up, initargs=(tuple(preload),))
+
+        # coalesced() plots rendered by this pool get one (waiting) thread per worker process
+        self.queue = RenderQueue(workers=processes)
+
+        # the workers are started (and warmed up) now rather than by the first renders
+        for future in [self._executor.submit(_started) for _ in range(processes)]:
+            future.result()
+
+    # Returns a Future of the (bytes, width, height) of func(*args, **kwargs) rendered in a worker
+    def submit(self, func, *args, format='png', dpi=144, **kwargs):
+        return self._executor.submit(_render, func, args, kwargs, format, dpi)
+
+    # (the whole round trip is the 'render' stage of an instrumented call, see Latency_Metrics.py)
+    def render(self, func, *args, format='png', dpi=144, **kwargs):
+        with stage('render'):
+            return self.submit(func, *args, format=format, dpi=dpi, **kwargs).result()
+
+    async def render_async(self, func, *args, format='png', dpi=144, **kwargs):
+        return await asyncio.wrap_future(self.submit(func, *args, format=format, dpi=dpi, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+# Whether the apps should draw their matplotlib plots in a RenderPool, e.g. `OFFLOAD_RENDERING=1 panel serve ...`
+def offload_rendering():
+    return os.environ.get("OFFLOAD_RENDERING", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+# Returns the process-wide RenderPool, starting it on the first call (the arguments of later calls are ignored)
+def render_pool(processes=None, preload=()):
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = RenderPool(processes, preload)
+        return _pool
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Pre-renders the plots of the Auto Bokeh app (Panel_and_Bokeh.py) into a static site
+#
+# Run it from the folder holding AutoMPG.xlsx with
+# >   python Static_Export.py --out site
+# and serve the resulting folder from any static web host (no Python needed per request).
+#
+# - The three widgets of the app only offer five columns each, so there are just 5 x 5 images of the matplotlib
+#   plot, 5 x 4 pandas_bokeh plots and 5 x 5 x 5 linked brushing plots. All of them are rendered up front, spread
+#   over a pool of worker processes: every worker imports the app script once and then calls its plot functions.
+#
+# - index.html has the same widgets and tabs as the app. Its widgets are plain bokeh Select widgets with a CustomJS
+#   callback that points the image/frames at the pre-rendered files of the selected columns. The bokeh plots are
+#   standalone HTML files (bokeh loaded from its CDN) and keep their interactivity, linked brushing included.
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# The options of uX, uY and uY2 in Panel_and_Bokeh.py, and the values they start with
+COLUMNS = ['Displacement', 'Horsepower', 'Weight', 'Acceleration', 'MPG']
+DEFAULTS = {'x': 'Horsepower', 'y': 'Acceleration', 'y2': 'Displacement'}
+
+
+# Where the artifact of one plot for the given columns goes, relative to the output folder
+def asset_path(kind, *columns):
+    extension = "png" if kind == "mpl" else "html"
+    return "{}/{}.{}".format(kind, "__".join(columns), extension)
+
+
+# pandas_bokeh refuses to plot a column against itself, so those pairs have no pandas_bokeh plot (the app shows an
+# error for them as well)
+def jobs():
+    pairs = list(itertools.product(COLUMNS, repeat=2))
+    return [("mpl",) + pair for pair in pairs] + \
+           [("pandasBokeh",) + pair for pair in pairs if pair[0] != pair[1]] + \
+           [("bokeh",) + triple for triple in itertools.product(COLUMNS, repeat=3)]
+
+
+# The app module, imported once per worker process
+_app = None
+
+
+def _start_worker():
+    global _app
+    import matplotlib
+    matplotlib.use("Agg")
+
+    # importing the app only declares its widgets and plot functions; the dataset is handed to it directly
+    import Panel_and_Bokeh
+    from Dataset_Loader import load_dataset
+    Panel_and_Bokeh.use_dataset(load_dataset("AutoMPG.xlsx"))
+    _app = Panel_and_Bokeh
+
+
+def _export(out, job):
+    from bokeh.embed import file_html
+    from bokeh.resources import CDN
+
+    kind, columns = job[0], job[1:]
+    path = os.path.join(out, asset_path(kind, *columns))
+
+    if kind == "mpl":
+        with open(path, "wb") as file:
+            file.write(_app.react_mpl_plot_weight(*columns).object)
+        return path
+
+    if kind == "pandasBokeh":
+        # (the plot function only returns the figure -- with show_figure=False, so that no worker writes a temporary
+        # HTML file of its own or tries to open a browser)
+        plot = _app.react_pandasBokeh_plot_weight(*columns)
+    else:
+        # bokeh_plot keeps its figures in the app module's globals for later widget changes; a fresh set per export is fine
+        plot = _app.bokeh_plot(*columns).object
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(file_html(plot, CDN, " / ".join(columns)))
+    return path
+
+
+def write_index(out):
+    from bokeh.embed import file_html
+    from bokeh.layouts import column, row
+    from bokeh.models import CustomJS, Div, Panel, Select, Tabs
+    from bokeh.resources import CDN
+
+    selects = {name: Select(title=title, options=COLUMNS, value=DEFAULTS[name], width=175)
+               for name, title in [('x', 'X-Axis Variable Selection'), ('y', 'Y-Axis Variable Selection'),
+                                   ('y2', 'Y2-Axis Variable Selection')]}
+    mpl = Div(width=440, height=370)
+    pandasBokeh = Div(width=470, height=360)
+    bokeh = Div(width=930, height=360)
+
+    swap = CustomJS(args=dict(mpl=mpl, pandasBokeh=pandasBokeh, bokeh=bokeh, **selects), code="""
+        const frame = (src, width, height) =>
+            `<iframe src="${src}" width="${width}" height="${height}" style="border: none"></iframe>`
+        mpl.text = `<img src="mpl/${x.value}__${y.value}.png" width="432">`
+        pandasBokeh.text = x.value == y.value ? "<p>pandas_bokeh can't plot a column against itself</p>"
+                                              : frame(`pandasBokeh/${x.value}__${y.value}.html`, 470, 360)
+        bokeh.text = frame(`bokeh/${x.value}__${y.value}__${y2.value}.html`, 930, 360)
+    """)
+    for select in selects.values():
+        select.js_on_change('value', swap)
+
+    # the same markup the callback produces, for the default selection
+    mpl.text = '<img src="{}" width="432">'.format(asset_path("mpl", DEFAULTS['x'], DEFAULTS['y']))
+    frame = '<iframe src="{}" width="{}" height="{}" style="border: none"></iframe>'
+    pandasBokeh.text = frame.format(asset_path("pandasBokeh", DEFAULTS['x'], DEFAULTS['y']), 470, 360)
+    bokeh.text = frame.format(asset_path("bokeh", DEFAULTS['x'], DEFAULTS['y'], DEFAULTS['y2']), 930, 360)
+
+    layout = column(Div(text="<b>** Auto MPG Explorer **</b>"),
+                    row(selects['x'], selects['y'], selects['y2']),
+                    Tabs(tabs=[Panel(child=row(mpl, pandasBokeh), title="MPL/pandasBokeh"),
+                               Panel(child=bokeh, title="Bokeh linked brushing demo")]))
+
+    path = os.path.join(out, "index.html")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(file_html(layout, CDN, "Auto Bokeh: Tabs/linked brushing"))
+    return path
+
+
+def export(out, workers=None):
+    for kind in ("mpl", "pandasBokeh", "bokeh"):
+        os.makedirs(os.path.join(out, kind), exist_ok=True)
+
+    todo = jobs()
+    start = time.perf_counter()
+    # spawn: every worker starts from a fresh interpreter and runs the app script on its own
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_start_worker) as pool:
+        for done, path in enumerate(pool.map(_export, itertools.repeat(out), todo, chunksize=4), 1):
+            if done % 25 == 0 or done == len(todo):
+                print("{:>4}/{} {}".format(done, len(todo), path))
+
+    print("wrote", write_index(out), "- {} plots in {:.1f} s".format(len(todo), time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-renders the Auto Bokeh app into a static site")
+    parser.add_argument('--out', default="site", help="output folder (default: site)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    # through the module rather than __main__, so that the worker processes can find _start_worker and _export
+    import Static_Export
+    Static_Export.export(args.out, args.workers)
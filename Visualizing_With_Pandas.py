@@ -4,156 +4,186 @@
 # Visualizing with pandas
 
 
-# To display the output of plotting commands inline within frontends like the Jupyter notebook
-get_ipython().run_line_magic('matplotlib', 'inline')
-
-# To add some basic interaction to the matplotlib charts
-get_ipython().run_line_magic('matplotlib', 'notebook')
-
-
 # importing all the needed libraries
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn
 
+# In Jupyter, use_notebook_backend() displays the output of plotting commands inline and adds some basic interaction
+# to the matplotlib charts (the %matplotlib notebook magic, see Notebook_Helpers.py). Importing this script draws
+# nothing: running it (or the notebook) calls main().
+from Notebook_Helpers import use_notebook_backend
+
+# crosstabs() counts several crosstabs of the same frame in one pass (see Aggregation_Helpers.py)
+from Aggregation_Helpers import crosstabs
+
+# Like pd.read_excel(), but with day, time, smoker and sex loaded as categoricals (see SCHEMAS in Dataset_Loader.py)
+from Dataset_Loader import read_dataset
+
+# cell() describes what one subplot of a grid shows (see Mpl_Helpers.py)
+from Mpl_Helpers import cell, draw_cells, plot_frame
+
+
+# The charts of the 2x2 tips grid, one cell(draw function, data, options) per subplot. main() draws them on a pyplot
+# figure with draw_cells(); a report job renders them with Mpl_Helpers.GridRenderer, which draws a chart again only
+# when its data or options changed since the previous grid:
+#   GridRenderer(2, 2, figsize=(10,6), wspace=.5, hspace=.5).png(tips_cells(...), title="Analyzing tips dataset")
+def tips_cells(dayCnt, smokeCnt, tipPCT, day, smokeDT):
+    return {
+        # 1. Number of parties by day
+        (0, 0): cell(plot_frame, dayCnt, kind='barh', title="Number of parties by day"),
+
+        # 2. How many parties were categorized as smoking vs. non-smoking diners? (with the title and axis labels of
+        # the smokeDT dictionary)
+        (0, 1): cell(plot_frame, smokeCnt, kind='bar', color=['green', 'red'], width=.5, **smokeDT),
+
+        # 3. An histogram with 10 bins for Tip%, without gridlines
+        (1, 0): cell(plot_frame, tipPCT, kind='hist', bins=10, grid=False,
+                     title='Frequency of tipping %', xlabel='Tip %'),
+
+        # 4. # of parties by the size of the party
+        (1, 1): cell(plot_frame, day, kind='bar', title='# of parties by the size of the party',
+                     xlabel="day of the week", legend=dict(loc="upper left", ncol=len(day.columns), fontsize=7)),
+    }
+
+
+def main():
+    use_notebook_backend()
+
+    plotDF = pd.DataFrame(np.random.rand(15, 5).cumsum(0), # Create 15x5 dataframe of randomly generated numbers that are cumulatively added up
+                          columns = ['AAPL','BOA','COST','DEC','FB'], # specify column names as a list
+                          index=pd.date_range('1/1/2020', periods=15)) # create a date-based index
+    plotDF.index = plotDF.index.to_period('D')
+    print(plotDF)
 
-plotDF = pd.DataFrame(np.random.rand(15, 5).cumsum(0), # Create 15x5 dataframe of randomly generated numbers that are cumulatively added up
-                      columns = ['AAPL','BOA','COST','DEC','FB'], # specify column names as a list
-                      index=pd.date_range('1/1/2020', periods=15)) # create a date-based index
-plotDF.index = plotDF.index.to_period('D')
-print(plotDF)
 
 
+    # First create the subplots with matplotlib, and then plot on a specific subplot by specifying the 'ax' keyword
 
-# First create the subplots with matplotlib, and then plot on a specific subplot by specifying the 'ax' keyword
+    # This will create a 2x2 grid of subplots and return the figure container (fig) and list of subplots (dfGrid).
+    fig, dfGrid = plt.subplots(2, 2, figsize=(12,8))
 
-# This will create a 2x2 grid of subplots and return the figure container (fig) and list of subplots (dfGrid).
-fig, dfGrid = plt.subplots(2, 2, figsize=(12,8))
+    # Add padding space around the subplots 
+    # Complete call signature: plt.subplots_adjust(left=None, bottom=None, right=None, top=None, wspace=None, hspace=None)
+    fig.subplots_adjust(wspace=.4, hspace=.4)
+    # fig.subplots_adjust(left=None, bottom=None, right=None, top=None, wspace=None, hspace=None)
 
-# Add padding space around the subplots 
-# Complete call signature: plt.subplots_adjust(left=None, bottom=None, right=None, top=None, wspace=None, hspace=None)
-fig.subplots_adjust(wspace=.4, hspace=.4)
-# fig.subplots_adjust(left=None, bottom=None, right=None, top=None, wspace=None, hspace=None)
+    # Bar chart will be added in the top left corner by specifying ax=dfGrid[0,0] 
+    plotDF.plot(kind='bar', ax=dfGrid[0,0])
+    dfGrid[0,0].set_xticklabels(labels=plotDF.index, rotation=30, fontsize='small')
 
-# Bar chart will be added in the top left corner by specifying ax=dfGrid[0,0] 
-plotDF.plot(kind='bar', ax=dfGrid[0,0])
-dfGrid[0,0].set_xticklabels(labels=plotDF.index, rotation=30, fontsize='small')
+    plotDF.AAPL.plot(kind='bar', ax=dfGrid[0,1])
 
-plotDF.AAPL.plot(kind='bar', ax=dfGrid[0,1])
+    plotDF[['AAPL','BOA']].plot(kind='bar', ax=dfGrid[1,0])
 
-plotDF[['AAPL','BOA']].plot(kind='bar', ax=dfGrid[1,0])
 
+    #dfGrid[0,0].cla()
 
-#dfGrid[0,0].cla()
+    # When plotting a single column
+    #dfGrid[0,1].cla()
+    plotDF.BOA.plot(kind='barh', ax=dfGrid[1,1])
 
-# When plotting a single column
-#dfGrid[0,1].cla()
-plotDF.BOA.plot(kind='barh', ax=dfGrid[1,1])
 
+    # #### In-class Practice exercises
+    # 1. In the last session, we created plots using all of the columns in the dataset (except for plot # 3). What if we wanted to create a plot using only some of the columns?
 
-# #### In-class Practice exercises
-# 1. In the last session, we created plots using all of the columns in the dataset (except for plot # 3). What if we wanted to create a plot using only some of the columns?
+    # Line chart in top right
+    plotDF.plot(kind='line', ax=dfGrid[0,1])
 
-# Line chart in top right
-plotDF.plot(kind='line', ax=dfGrid[0,1])
+    # histogram for values in column AAPL in bottom left
+    plotDF.AAPL.plot(kind='hist', ax=dfGrid[1,0])
 
-# histogram for values in column AAPL in bottom left
-plotDF.AAPL.plot(kind='hist', ax=dfGrid[1,0])
+    # Horizontal stacked bar chart in bottom right
+    plotDF.plot(kind='barh', stacked=True, ax=dfGrid[1,1])
 
-# Horizontal stacked bar chart in bottom right
-plotDF.plot(kind='barh', stacked=True, ax=dfGrid[1,1])
+    # When plotting two or more columns
+    dfGrid[0,0].cla()
+    plotDF[['AAPL','DEC']].plot(kind='barh', ax=dfGrid[0,0])
 
-# When plotting two or more columns
-dfGrid[0,0].cla()
-plotDF[['AAPL','DEC']].plot(kind='barh', ax=dfGrid[0,0])
 
+    # #### For more detailed guide on creating quick visualizations using pandas refer to https://pandas.pydata.org/pandas-docs/dev/user_guide/visualization.html
 
-# #### For more detailed guide on creating quick visualizations using pandas refer to https://pandas.pydata.org/pandas-docs/dev/user_guide/visualization.html
+    # # Let's work through a dataset to create visualizations with pandas
 
-# # Let's work through a dataset to create visualizations with pandas
+    # ## A 5-step process to creating visualizations
+    # - What is the question that you will be willing to explore?
+    # - What variable(s) you will need to use? This will greatly drive the kind of visualization you should use 
+    # - Organize your views. You will need more than one view to identify and discern interesting insights 
+    # - Prepare your data. This will be the most time-consuming step (and has nothing to do with visualization itself!)
+    # - Plot your data
 
-# ## A 5-step process to creating visualizations
-# - What is the question that you will be willing to explore?
-# - What variable(s) you will need to use? This will greatly drive the kind of visualization you should use 
-# - Organize your views. You will need more than one view to identify and discern interesting insights 
-# - Prepare your data. This will be the most time-consuming step (and has nothing to do with visualization itself!)
-# - Plot your data
+    # #### Valuable pandas commands to slice-and-dice your data
+    # 1. pd.groupby()
+    # 2. pd.crosstab()
+    # 3. pd.pivot_table()
 
-# #### Valuable pandas commands to slice-and-dice your data
-# 1. pd.groupby()
-# 2. pd.crosstab()
-# 3. pd.pivot_table()
+    tipsDF = read_dataset("tips.xlsx")
+    tipsDF
 
-tipsDF = pd.read_excel("tips.xlsx")
-tipsDF
+    # Create the figure and subplots 
+    tipFig, tipGrid = plt.subplots(2,2, figsize=(10,6))
+    # IF you would like to customize the grid layout further, refer to https://matplotlib.org/3.1.0/tutorials/intermediate/gridspec.html
 
-# Create the figure and subplots 
-tipFig, tipGrid = plt.subplots(2,2, figsize=(10,6))
-# IF you would like to customize the grid layout further, refer to https://matplotlib.org/3.1.0/tutorials/intermediate/gridspec.html
+    # Add the title for the figure container
+    tipFig.suptitle("Analyzing tips dataset", fontsize=15)
 
-# Add the title for the figure container
-tipFig.suptitle("Analyzing tips dataset", fontsize=15)
+    # Adjusting the padding space around subplots
+    tipFig.subplots_adjust(wspace=.5, hspace=.5)
 
-# Adjusting the padding space around subplots
-tipFig.subplots_adjust(wspace=.5, hspace=.5)
 
+    # pd.crosstab(rows, columns) counts how many rows there are for every combination of the values of two columns.
+    # The charts below need three of them:
+    #   dayCnt = pd.crosstab(tipsDF.day, tipsDF.time)
+    #   smokeCnt = pd.crosstab(tipsDF.day, tipsDF.smoker)
+    #   day = pd.crosstab(tipsDF['day'], tipsDF['size'])
+    # crosstabs() returns the very same tables, counted all at once
+    dayCnt, smokeCnt, day = crosstabs(tipsDF, [('day', 'time'), ('day', 'smoker'), ('day', 'size')])
 
-# 1. Number of parties by day
-dayCnt = pd.crosstab(tipsDF.day, tipsDF.time)
-print(dayCnt)
-dayCnt.plot.barh(ax=tipGrid[0,0], title="Number of parties by day")
+    # 1. Number of parties by day
+    print(dayCnt)
 
 
-# 2. How many parties were categorized as smoking vs. non-smoking diners? Create a bar chart to show this visually
-smokeCnt = pd.crosstab(tipsDF.day, tipsDF.smoker)
-print(smokeCnt)
-smokeCnt.plot.bar(ax=tipGrid[0,1],color=['green', 'red'], width=.5)
+    # 2. How many parties were categorized as smoking vs. non-smoking diners? Create a bar chart to show this visually
+    print(smokeCnt)
 
-# Setting the properties using set_title and dictionary approach
-smokeDT = {'title':"# of smoking parties by day",
-           'xlabel':'day of the week',
-           'ylabel':'count'}
+    # Setting the properties using set_title and dictionary approach
+    smokeDT = {'title':"# of smoking parties by day",
+               'xlabel':'day of the week',
+               'ylabel':'count'}
 
-tipGrid[0,1].set(**smokeDT)
+    # (tips_cells() passes them on to the bar chart, like tipGrid[0,1].set(**smokeDT) does)
 
 
+    # 3. Create an histogram with 10 bins for Tip% 
+    # First, calculate the % of tip that was paid as part of the total bill and add that as a column to your existing DF
+    tipsDF['tipPCT'] = tipsDF['tip']/tipsDF['total_bill'] * 100
+    tipsDF
 
-# 3. Create an histogram with 10 bins for Tip% 
-# First, calculate the % of tip that was paid as part of the total bill and add that as a column to your existing DF
-tipsDF['tipPCT'] = tipsDF['tip']/tipsDF['total_bill'] * 100
-tipsDF
 
+    # 4. # of parties by the size of the party
 
-# Now Plot the histogram and set the gridlines to false
+    print(day)
 
-tipGrid[1,0].cla()
-tipsDF.tipPCT.hist(bins=10,  ax=tipGrid[1,0])
-tipGrid[1,0].grid(False)
-tipsDT = {'title':'Frequency of tipping %', 
-          'xlabel':'Tip %'}
-tipGrid[1,0].set(**tipsDT)
 
+    # Now draw all four charts, each on its subplot. Every chart is drawn once: changing one of them means changing
+    # its cell and drawing it again, rather than cla() and re-plotting on the same subplot.
+    draw_cells(tipGrid, tips_cells(dayCnt, smokeCnt, tipsDF.tipPCT, day, smokeDT))
 
-# 4. # of parties by the size of the party
 
-day = pd.crosstab(tipsDF['day'], tipsDF['size']) 
-print(day)
-day.plot.bar(ax=tipGrid[1,1], title='# of parties by the size of the party', 
-             xlabel="day of the week")
-tipGrid[1,1].legend(loc="upper left", ncol=len(day.columns),fontsize=7)
+    # ### Clearing plot space
+    # 
+    # - plt.cla(): To clear a subplot 
+    # - plt.clf(): To clear an entire figure (Careful as this will clear and remove all the subplots too)
 
 
-# ### Clearing plot space
-# 
-# - plt.cla(): To clear a subplot 
-# - plt.clf(): To clear an entire figure (Careful as this will clear and remove all the subplots too)
+    # Clearing plot space
 
+    #plt.cla(): To clear a subplot 
+    tipGrid[1,0].cla()
 
-# Clearing plot space
+    #plt.clf(): To clear an entire figure (Careful as this will clear and remove all the subplots too)
+    #tipFig.clf()
 
-#plt.cla(): To clear a subplot 
-tipGrid[1,0].cla()
 
-#plt.clf(): To clear an entire figure (Careful as this will clear and remove all the subplots too)
-#tipFig.clf()
+if __name__ == "__main__":
+    main()
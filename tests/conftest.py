@@ -0,0 +1,36 @@
+# Shared fixtures of the tests. Run them from the repository folder with
+# >   python -m pytest tests
+#
+# The tests work on synthetic workbooks (see Benchmarks.py) written to a temporary folder, which is made the working
+# directory of the test, since the apps read AutoMPG.xlsx from there.
+
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Dataset_Loader
+from Benchmarks import make_synthetic_auto
+
+
+@pytest.fixture
+def auto_folder(tmp_path, monkeypatch):
+    make_synthetic_auto(400).to_excel(tmp_path / "AutoMPG.xlsx", index=False)
+    monkeypatch.chdir(tmp_path)
+    # streams are kept by (relative) path, so one made by an earlier test would still hold that test's workbook
+    monkeypatch.setattr(Dataset_Loader, '_streams', {})
+    return tmp_path
+
+
+# Waits until a RenderQueue has rendered (or dropped) everything queued
+def wait_for_renders(queue, timeout=60):
+    deadline = time.monotonic() + timeout
+    while queue.stats()['queueDepth'] or queue.stats()['running']:
+        assert time.monotonic() < deadline, "renders still running after {} s".format(timeout)
+        time.sleep(0.01)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from Benchmarks import make_synthetic_auto
+from Bokeh_Helpers import ViewportSource, make_cds
+
+
+class _Layer:
+
+    def __init__(self, rows):
+        self.rows = rows
+
+
+def test_a_stale_selection_keeps_only_the_rows_still_sent():
+    auto = make_synthetic_auto(50)
+    points = ViewportSource(make_cds(auto, ['Weight', 'MPG']), auto)
+    layer = _Layer(np.arange(20, 40))
+    points.layers.append(layer)
+    points.refresh()
+
+    points.source.selected.indices = [1, 15]
+    assert points.selectedRows.tolist() == [21, 35]
+
+    # the view shrinks to fewer rows while the browser still selects in the old ones
+    layer.rows = np.arange(20, 30)
+    points.refresh()
+    points.source.selected.indices = [1, 15, -1]
+    assert points.selectedRows.tolist() == [21]
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import panel as pn
+
+from Panel_Helpers import RenderQueue, coalesced
+from conftest import wait_for_renders
+
+
+def test_a_slow_plot_does_not_hold_up_other_plots():
+    queue = RenderQueue(workers=2)
+    slowWidget = pn.widgets.IntSlider(start=0, end=10, value=0)
+    fastWidget = pn.widgets.IntSlider(start=0, end=10, value=0)
+    release = threading.Event()
+
+    def slow_plot(value):
+        release.wait(10)
+        return pn.pane.Str("slow {}".format(value))
+
+    slow = coalesced(slow_plot, slowWidget, queue=queue)
+    fast = coalesced(lambda value: pn.pane.Str("fast {}".format(value)), fastWidget, queue=queue)
+    fastWidget.value = 3
+
+    deadline = time.monotonic() + 5
+    while not (isinstance(fast[0], pn.pane.Str) and fast[0].object == "fast 3"):
+        assert time.monotonic() < deadline, "the fast plot waited for the slow one"
+        time.sleep(0.01)
+    assert not isinstance(slow[0], pn.pane.Str)
+
+    release.set()
+    wait_for_renders(queue)
+    assert slow[0].object == "slow 0"
+
+
+def test_a_plot_renders_one_at_a_time_and_ends_with_the_latest_values():
+    queue = RenderQueue(workers=4)
+    widget = pn.widgets.IntSlider(start=0, end=100, value=0)
+    lock = threading.Lock()
+    active, overlaps = [0], []
+
+    def plot(value):
+        with lock:
+            active[0] += 1
+            overlaps.append(active[0])
+        time.sleep(0.005)
+        with lock:
+            active[0] -= 1
+        return pn.pane.Str(str(value))
+
+    pane = coalesced(plot, widget, queue=queue)
+    for value in range(1, 101):
+        widget.value = value
+        time.sleep(0.001)
+    wait_for_renders(queue)
+
+    assert max(overlaps) == 1
+    assert pane[0].object == "100"
+    stats = queue.stats()
+    assert stats['events'] == 100 and stats['rendered'] >= 1
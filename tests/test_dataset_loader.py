@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+import Dataset_Loader
+from Benchmarks import make_synthetic_auto
+from Dataset_Loader import cache_path, load_dataset, source_key
+
+
+def _cache_files(folder):
+    return sorted(os.listdir(folder / Dataset_Loader.CACHE_DIR))
+
+
+def test_datasets_with_similar_names_keep_their_own_cache(tmp_path):
+    for name in ("AutoMPG.xlsx", "AutoMPG.v2.xlsx", "AutoMPG.xlsm"):
+        make_synthetic_auto(20).to_excel(tmp_path / name, index=False)
+
+    paths = [str(tmp_path / name) for name in ("AutoMPG.xlsx", "AutoMPG.v2.xlsx", "AutoMPG.xlsm")]
+    for path in paths:
+        load_dataset(path)
+    for path in paths:
+        assert os.path.exists(cache_path(path, source_key(path)))
+    assert len(_cache_files(tmp_path)) == 3
+
+
+def test_a_new_version_of_the_workbook_replaces_its_cache_only(tmp_path):
+    path, other = str(tmp_path / "AutoMPG.xlsx"), str(tmp_path / "AutoMPG.v2.xlsx")
+    make_synthetic_auto(20).to_excel(path, index=False)
+    make_synthetic_auto(20).to_excel(other, index=False)
+    load_dataset(path)
+    load_dataset(other)
+    oldCache = cache_path(path, source_key(path))
+
+    # (a different size, so the key changes even if the modification time doesn't)
+    time.sleep(0.01)
+    make_synthetic_auto(30, seed=1).to_excel(path, index=False)
+    assert len(load_dataset(path)) == 30
+
+    assert not os.path.exists(oldCache)
+    assert os.path.exists(cache_path(path, source_key(path)))
+    assert os.path.exists(cache_path(other, source_key(other)))
+
+
+def _declare_sizes(divisor):
+    Dataset_Loader.declare_column('test_size', lambda frame: frame['Weight'] / divisor)
+
+
+def test_a_column_can_only_be_redeclared_with_the_same_computation(monkeypatch):
+    monkeypatch.setattr(Dataset_Loader, '_derivations', {})
+    _declare_sizes(300)
+    # a script executed again for the next session
+    _declare_sizes(300)
+    with pytest.raises(ValueError):
+        _declare_sizes(200)
+    with pytest.raises(ValueError):
+        Dataset_Loader.declare_column('test_size', lambda frame: frame['Weight'] * 2)
+
+
+def test_derived_frame_holds_only_the_columns_asked_for(monkeypatch):
+    monkeypatch.setattr(Dataset_Loader, '_derivations', {})
+    _declare_sizes(300)
+    auto = make_synthetic_auto(50)
+
+    plotted = Dataset_Loader.derived_frame(auto, ['test_size'], columns=['Weight', 'Horsepower'])
+    assert list(plotted.columns) == ['Weight', 'Horsepower', 'test_size']
+    assert (plotted['test_size'] == auto['Weight'] / 300).all()
+    assert Dataset_Loader.derived_frame(auto, ['test_size'], columns=['Weight', 'Horsepower']) is plotted
+    assert 'test_size' not in auto.columns
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from Mpl_Helpers import GridRenderer, cell, plot_frame
+
+# read by draw_global_frame() below
+globalFrame = pd.DataFrame({'value': [1, 2, 3]})
+
+
+def draw_global_frame(ax):
+    globalFrame.plot(ax=ax, legend=False)
+
+
+class Series:
+
+    def __init__(self, values):
+        self.values = values
+        self.version = 0
+
+    def draw(self, ax):
+        ax.plot(self.values)
+
+
+def _render(renderer, draw):
+    renderer.render({(0, 0): cell(draw), (0, 1): cell(plot_frame, pd.Series([3, 1, 2]), kind='bar')})
+    return renderer.cellsDrawn
+
+
+def test_only_changed_cells_are_drawn_again():
+    renderer = GridRenderer(1, 2, figsize=(4, 2))
+    series = Series([1, 2, 3])
+    assert _render(renderer, series.draw) == 2
+    assert _render(renderer, series.draw) == 2
+
+    # the same method of another object
+    other = Series([3, 2, 1])
+    assert _render(renderer, other.draw) == 3
+
+    # the object changed, and says so with its version
+    other.values.append(0)
+    other.version += 1
+    assert _render(renderer, other.draw) == 4
+
+
+def test_a_global_frame_assigned_anew_is_drawn_again():
+    global globalFrame
+    renderer = GridRenderer(1, 2, figsize=(4, 2))
+    assert _render(renderer, draw_global_frame) == 2
+    assert _render(renderer, draw_global_frame) == 2
+
+    globalFrame = pd.DataFrame({'value': np.arange(5)})
+    assert _render(renderer, draw_global_frame) == 3
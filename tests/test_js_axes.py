@@ -0,0 +1,62 @@
+import pytest
+from bokeh.document import Document
+
+from Bokeh_Helpers import JS_AXES_TAG
+
+
+@pytest.fixture
+def linked_brushing(auto_folder, monkeypatch):
+    import Panel_and_Bokeh
+
+    monkeypatch.setattr(Panel_and_Bokeh, 'bokeh_pane', None)
+    monkeypatch.setattr(Panel_and_Bokeh, 'densityLayers', {})
+    calls = []
+    show_bokeh_plot = Panel_and_Bokeh.show_bokeh_plot
+
+    def counted(*values):
+        calls.append(values)
+        return show_bokeh_plot(*values)
+
+    monkeypatch.setattr(Panel_and_Bokeh, 'show_bokeh_plot', counted)
+    return Panel_and_Bokeh, calls
+
+
+def _open_linked_brushing_tab(Panel_and_Bokeh):
+    doc = Document()
+    app = Panel_and_Bokeh.build_app()
+    doc.add_root(app.get_root(doc))
+    app[1].active = 1
+    return doc
+
+
+# The document events a change of the widget causes on the server, other than the one of the widget itself
+def _events_of_change(doc, widget, value):
+    events = []
+    doc.on_change(lambda event: events.append(event))
+    widget.value = value
+    return [event for event in events if getattr(getattr(event, 'model', None), 'title', None) != widget.name]
+
+
+def test_js_axes_leave_the_widgets_to_the_browser(linked_brushing):
+    Panel_and_Bokeh, calls = linked_brushing
+    doc = _open_linked_brushing_tab(Panel_and_Bokeh)
+    assert len(calls) == 1
+    assert JS_AXES_TAG in Panel_and_Bokeh.bokeh_pane.object.select_one({'name': 'Scatter-1'}).tags
+
+    uY2 = Panel_and_Bokeh.uY2
+    newValue = next(option for option in uY2.options if option != uY2.value)
+    assert _events_of_change(doc, uY2, newValue) == []
+    assert len(calls) == 1
+
+
+def test_python_axes_follow_the_widgets(linked_brushing, monkeypatch):
+    Panel_and_Bokeh, calls = linked_brushing
+    monkeypatch.setattr(Panel_and_Bokeh, 'jsAxes', False)
+    doc = _open_linked_brushing_tab(Panel_and_Bokeh)
+
+    uY2 = Panel_and_Bokeh.uY2
+    newValue = next(option for option in uY2.options if option != uY2.value)
+    uY2.value = newValue
+    assert len(calls) == 2
+    points = Panel_and_Bokeh.bokeh_pane.object.select_one({'name': 'Scatter-2 points'})
+    assert points.glyph.y == newValue
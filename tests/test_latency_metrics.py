@@ -0,0 +1,90 @@
+import socket
+import time
+
+import panel as pn
+from bokeh.client import pull_session
+
+import Latency_Metrics
+from Latency_Metrics import instrumented, latencyMetrics
+from Panel_Helpers import RenderQueue, coalesced
+from conftest import wait_for_renders
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def _counts(function, stageName):
+    return sum(count for (name, stage), (count, total, counts) in latencyMetrics.snapshot().items()
+               if name == function and stage == stageName)
+
+
+def test_a_widget_change_books_serialize_and_send_to_the_plot_that_ran():
+    queue = RenderQueue(workers=2)
+
+    @instrumented
+    def metrics_test_plot(value):
+        return pn.pane.Str("value {}".format(value))
+
+    def app():
+        widget = pn.widgets.IntSlider(name="metrics_test_slider", start=0, end=10, value=0)
+        return pn.Column(widget, coalesced(metrics_test_plot, widget, queue=queue))
+
+    Latency_Metrics.instrument_bokeh_server()
+    port = _free_port()
+    server = pn.serve({'app': app}, port=port, show=False, threaded=True, websocket_origin="*")
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                session = pull_session(url="http://localhost:{}/app".format(port))
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "the server did not come up"
+                time.sleep(0.1)
+        wait_for_renders(queue)
+        latencyMetrics.clear()
+        # so that only the call the widget change makes (on a thread of the queue) can book the messages
+        Latency_Metrics._lastCall.clear()
+
+        slider = session.document.select_one({'title': "metrics_test_slider"})
+        slider.value = 7
+        deadline = time.monotonic() + 30
+        while not (_counts('metrics_test_plot', 'serialize') and _counts('metrics_test_plot', 'send')):
+            assert time.monotonic() < deadline, latencyMetrics.prometheus()
+            # runs the client's loop, which sends the change and receives what the server sends back
+            session.request_server_info()
+            time.sleep(0.05)
+        assert _counts('metrics_test_plot', 'total') >= 1
+        session.close()
+    finally:
+        server.stop()
+        Latency_Metrics.uninstrument_bokeh_server()
+        latencyMetrics.clear()
+
+
+def _metric(name):
+    for line in latencyMetrics.prometheus().splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    raise AssertionError("{} is not exported".format(name))
+
+
+def test_the_render_cache_counters_are_exported():
+    from matplotlib.figure import Figure
+    from Panel_Helpers import memoize_png
+
+    @memoize_png(lambda: "metrics-test")
+    def cached_plot(value):
+        fig = Figure(figsize=(2, 2))
+        fig.add_subplot().plot([0, value])
+        return fig
+
+    hits, misses = _metric('panel_render_cache_hits_total'), _metric('panel_render_cache_misses_total')
+    cached_plot(1)
+    cached_plot(1)
+    assert _metric('panel_render_cache_misses_total') == misses + 1
+    assert _metric('panel_render_cache_hits_total') == hits + 1
+    assert _metric('panel_render_cache_bytes') > 0
@@ -0,0 +1,33 @@
+import matplotlib.pyplot as plt
+import panel as pn
+
+from Mpl_Helpers import FigurePool
+from Panel_Helpers import renderCache
+
+
+def test_plots_reuse_one_figure_per_plot_and_leave_no_pyplot_figures(auto_folder, monkeypatch):
+    import Panel_ReactiveAPI
+
+    monkeypatch.setattr(Panel_ReactiveAPI, 'offloadRendering', False)
+    monkeypatch.setattr(Panel_ReactiveAPI, 'mplPool', FigurePool())
+    Panel_ReactiveAPI.load_data()
+    uX, uY, uC, uS = Panel_ReactiveAPI.plotWidgets
+    plt.close('all')
+
+    figures = set()
+    for call in range(200):
+        # every call draws again instead of hitting the PNG cache
+        renderCache.clear()
+        xVar = uX.options[call % len(uX.options)]
+        yVar = uY.options[(call // 3) % len(uY.options)]
+        pane = Panel_ReactiveAPI.react_mpl_plot(xVar, yVar, uC.value, call % 20 + 1)
+        assert isinstance(pane, pn.pane.PNG) and pane.object.startswith(b'\x89PNG')
+        if call % 10 == 0:
+            renderCache.clear()
+            Panel_ReactiveAPI.react_mpl_plot_weight(xVar, yVar, uC.value)
+        figures.update(id(fig) for fig, ax in Panel_ReactiveAPI.mplPool._figures.values())
+
+    assert plt.get_fignums() == []
+    assert sorted(Panel_ReactiveAPI.mplPool._figures) == ['react_mpl_plot', 'react_mpl_plot_weight']
+    # the same two figures were drawn on all along
+    assert len(figures) == 2
@@ -0,0 +1,60 @@
+import panel as pn
+import pytest
+
+import Render_Pool
+from Panel_Helpers import renderCache
+from conftest import wait_for_renders
+
+
+@pytest.fixture
+def pool_off():
+    yield
+    if Render_Pool._pool is not None:
+        Render_Pool._pool.shutdown()
+        Render_Pool._pool = None
+
+
+@pytest.mark.parametrize("value, expected", [(None, False), ("", False), ("0", False), ("1", True), ("yes", True),
+                                             ("True", True)])
+def test_offload_rendering_reads_the_environment(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv("OFFLOAD_RENDERING", raising=False)
+    else:
+        monkeypatch.setenv("OFFLOAD_RENDERING", value)
+    assert Render_Pool.offload_rendering() is expected
+
+
+def _in_process_only(*args, **kwargs):
+    raise AssertionError("drawn in the server process although rendering is offloaded")
+
+
+def test_reactive_api_renders_in_the_pool(auto_folder, monkeypatch, pool_off):
+    import Panel_ReactiveAPI
+
+    monkeypatch.setattr(Panel_ReactiveAPI, 'offloadRendering', True)
+    monkeypatch.setattr(Panel_ReactiveAPI, 'renderPool', None)
+    monkeypatch.setattr(Panel_ReactiveAPI, 'plot_scatter', _in_process_only)
+    renderCache.clear()
+
+    apps = Panel_ReactiveAPI.build_app()
+    wait_for_renders(Panel_ReactiveAPI.renderPool.queue)
+
+    for app in apps:
+        shown = app[1][0]
+        assert isinstance(shown, pn.pane.PNG) and shown.object.startswith(b'\x89PNG')
+
+
+def test_auto_bokeh_renders_in_the_pool(auto_folder, monkeypatch, pool_off):
+    import Panel_and_Bokeh
+
+    monkeypatch.setattr(Panel_and_Bokeh, 'offloadRendering', True)
+    monkeypatch.setattr(Panel_and_Bokeh, 'renderPool', None)
+    monkeypatch.setattr(Panel_and_Bokeh, 'plot_by_category', _in_process_only)
+    renderCache.clear()
+
+    app = Panel_and_Bokeh.build_app()
+    wait_for_renders(Panel_and_Bokeh.renderPool.queue)
+
+    # the first tab: the matplotlib plot, next to the pandas_bokeh plot
+    shown = app[1][0][0][0]
+    assert isinstance(shown, pn.pane.PNG) and shown.object.startswith(b'\x89PNG')